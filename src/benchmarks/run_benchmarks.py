@@ -0,0 +1,328 @@
+"""
+Benchmarks for SlidesBuilder, PPTXLoader and QR generation on synthetic decks.
+
+Run from the src directory, e.g.:
+
+    python -m benchmarks.run_benchmarks --sizes 10 100 1000 --output results.json
+    python -m benchmarks.run_benchmarks --sizes 10 100 --baseline results.json
+
+Each case runs in its own process so its peak RSS can be measured. Results are written as JSON
+and, when a baseline file is given, compared against it; the exit code is 1 if any case got
+slower or bigger than the tolerance allows.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from PIL import Image, ImageDraw
+
+DEFAULT_TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "tests", "inputs", "test2.pptx")
+DEFAULT_SIZES = [10, 100, 1000]
+QR_DATA = "engageli-op://{'op': 'PBM'}"
+QR_OPTIONS = {0: "Option A", 1: "Option B", 2: "Option C", 3: "Option D"}
+
+# Number of distinct synthetic images, so decks contain both unique and repeated images
+IMAGE_VARIANTS = 8
+
+
+def stub_ocr(blob):
+    """
+    OCR backend used by the benchmarks, so the loader is measured without tesseract.
+    """
+    return f"{len(blob)} bytes"
+
+
+def make_images(directory, count=IMAGE_VARIANTS, seed=0):
+    """
+    Write synthetic images of varied size and format and return their paths.
+    """
+    rng = random.Random(seed)
+    paths = []
+    for i in range(count):
+        width = rng.randint(200, 1600)
+        height = rng.randint(150, 1200)
+        image = Image.new("RGB", (width, height), tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(image)
+        for _ in range(20):
+            x0, y0 = rng.randrange(width), rng.randrange(height)
+            x1, y1 = rng.randint(x0, width), rng.randint(y0, height)
+            draw.rectangle((x0, y0, x1, y1), fill=tuple(rng.randrange(256) for _ in range(3)))
+
+        extension = "png" if i % 2 == 0 else "jpg"
+        path = os.path.join(directory, f"image{i}.{extension}")
+        image.save(path)
+        paths.append(path)
+    return paths
+
+
+def make_deck(template, size, directory):
+    """
+    Generate a synthetic deck of `size` added slides (QR, full-slide image and title/content
+    slides, with notes on every other slide) and return its path.
+    """
+    from slides_builder.slides_builder import SlidesBuilder
+
+    path = os.path.join(directory, f"deck{size}.pptx")
+    if os.path.exists(path):
+        return path
+
+    images = make_images(directory)
+    builder = SlidesBuilder(template)
+    with builder.batch():
+        for i in range(size):
+            if i % 3 == 0:
+                # First (here only) page of the poll; presentation.slides would renumber the whole deck
+                slide = builder.add_qr_slide(QR_DATA, QR_OPTIONS, f"Poll {i}")[0]
+            elif i % 3 == 1:
+                slide = builder.add_full_slide_image(images[i % len(images)])
+            else:
+                slide = builder.add_slide_with_title_and_content(f"Slide {i}", f"Content of slide {i}")
+
+            if i % 2 == 0:
+                builder.append_notes_to_slide(slide, json.dumps({"op": "PBM", "slide": i}))
+    builder.save(path)
+    return path
+
+
+def bench_add_qr_slide(template, size, directory):
+    from content_generators.qr_generator import QRGenerator
+    from slides_builder.slides_builder import SlidesBuilder
+
+    QRGenerator.clear_cache()
+    builder = SlidesBuilder(template)
+    start = time.perf_counter()
+    for i in range(size):
+        builder.add_qr_slide(QR_DATA, QR_OPTIONS, f"Poll {i}")
+    return time.perf_counter() - start, {}
+
+
+def bench_stamp_qr_slide(template, size, directory, distinct=False):
+    from content_generators.qr_generator import QRGenerator
+    from slides_builder.slides_builder import SlidesBuilder
+
+    builder = SlidesBuilder(template)
+    sample_data = f"{QR_DATA}#{size - 1}" if distinct else QR_DATA
+    pages = builder.compile_qr_slide(len(QR_OPTIONS), sample_data, slide_content="")
+    # Encoded up front, so only stamping is timed
+    qr_pngs = [QRGenerator.generate_qr_png(json.dumps(f"{QR_DATA}#{i}" if distinct else QR_DATA)) for i in range(size)]
+    rows = [({"title": f"Poll {i}", **{f"option{j}": text for j, text in QR_OPTIONS.items()}}, {"qr": qr_pngs[i]})
+            for i in range(size)]
+    start = time.perf_counter()
+    with builder.batch():
+        for values, images in rows:
+            for page in pages:
+                page.stamp(values, images)
+    return time.perf_counter() - start, {}
+
+
+def bench_stamp_qr_slide_distinct(template, size, directory):
+    # Every poll with its own QR code, so each stamped slide adds an image part
+    return bench_stamp_qr_slide(template, size, directory, distinct=True)
+
+
+def bench_add_full_slide_image(template, size, directory):
+    from slides_builder.slides_builder import SlidesBuilder
+
+    images = make_images(directory)
+    builder = SlidesBuilder(template)
+    start = time.perf_counter()
+    for i in range(size):
+        builder.add_full_slide_image(images[i % len(images)])
+    return time.perf_counter() - start, {}
+
+
+def bench_insert_slide_at_index(template, size, directory):
+    from slides_builder.slides_builder import SlidesBuilder
+
+    builder = SlidesBuilder(make_deck(template, size, directory))
+    slide_layout = builder.presentation.slide_layouts[6]
+    rng = random.Random(size)
+    start = time.perf_counter()
+    for _ in range(size):
+        builder.insert_slide_at_index(slide_layout, rng.randint(0, builder.slide_count()))
+    return time.perf_counter() - start, {}
+
+
+def bench_save(template, size, directory):
+    from slides_builder.slides_builder import SlidesBuilder
+
+    builder = SlidesBuilder(make_deck(template, size, directory))
+    builder.add_qr_slide(QR_DATA, QR_OPTIONS, "Extra poll")
+    output = BytesIO()
+    start = time.perf_counter()
+    builder.save(output)
+    return time.perf_counter() - start, {"output_bytes": len(output.getvalue())}
+
+
+def bench_get_pptx_content(template, size, directory):
+    from loaders.ocr_stage import OCRStage
+    from loaders.pptx_loader import PPTXLoader
+
+    deck = make_deck(template, size, directory)
+    start = time.perf_counter()
+    loader = PPTXLoader(deck, ocr_stage=OCRStage(workers=0, ocr_function=stub_ocr))
+    content = loader.get_pptx_content()
+    return time.perf_counter() - start, {"output_bytes": len(content)}
+
+
+def bench_extract_notes(template, size, directory):
+    from loaders.pptx_loader import PPTXLoader
+
+    deck = make_deck(template, size, directory)
+    start = time.perf_counter()
+    PPTXLoader(deck).extract_notes_after_delimiter_for_all_slides("###")
+    return time.perf_counter() - start, {}
+
+
+def bench_notes_reader(template, size, directory):
+    from loaders.notes_reader import NotesReader
+
+    deck = make_deck(template, size, directory)
+    start = time.perf_counter()
+    NotesReader(deck).extract_text_from_notes_between_delimiters_for_all_slides()
+    return time.perf_counter() - start, {}
+
+
+CASES = {
+    "add_qr_slide": bench_add_qr_slide,
+    "stamp_qr_slide": bench_stamp_qr_slide,
+    "stamp_qr_slide_distinct": bench_stamp_qr_slide_distinct,
+    "add_full_slide_image": bench_add_full_slide_image,
+    "insert_slide_at_index": bench_insert_slide_at_index,
+    "save": bench_save,
+    "get_pptx_content": bench_get_pptx_content,
+    "extract_notes_after_delimiter": bench_extract_notes,
+    "notes_reader": bench_notes_reader,
+}
+
+
+def run_case(name, template, size, directory):
+    """
+    Run one benchmark case; meant to be called in a fresh process.
+    """
+    seconds, extra = CASES[name](template, size, directory)
+    result = {
+        "case": name,
+        "slides": size,
+        "seconds": seconds,
+        "throughput": size / seconds if seconds else None,
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // (1024 if sys.platform == "darwin" else 1),
+    }
+    result.update(extra)
+    return result
+
+
+def run_benchmarks(template, sizes, cases, repeat=1, directory=None):
+    """
+    Run the benchmark cases for every deck size and return the results.
+
+    :param template: Path to the template deck the synthetic decks are built on
+    :param sizes: Number of slides of the synthetic decks
+    :param cases: Names of the cases to run
+    :param repeat: Number of runs per case, the fastest one is reported
+    :param directory: Directory for the generated decks and images, a temporary one if None
+    :return: A dict with metadata and the list of results
+    """
+    with tempfile.TemporaryDirectory() as temp_directory:
+        directory = directory or temp_directory
+        context = multiprocessing.get_context("spawn")
+        results = []
+
+        for size in sizes:
+            # Build the synthetic deck up front so its cost is not part of any case
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                executor.submit(make_deck, template, size, directory).result()
+
+            for name in cases:
+                runs = []
+                for _ in range(repeat):
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        runs.append(executor.submit(run_case, name, template, size, directory).result())
+                best = min(runs, key=lambda run: run["seconds"])
+                results.append(best)
+                print(f"{name:<32} {size:>6} slides {best['seconds']:>9.3f}s "
+                      f"{best['peak_rss_kb'] / 1024:>8.1f} MB", file=sys.stderr)
+
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "template": os.path.basename(template),
+            "repeat": repeat,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def compare_to_baseline(report, baseline, tolerance):
+    """
+    Compare results against a baseline report.
+
+    :param report: The report returned by run_benchmarks
+    :param baseline: A previous report
+    :param tolerance: Allowed relative increase of time, peak RSS and output size
+    :return: List of regression descriptions, empty if there are none
+    """
+    baseline_results = {(result["case"], result["slides"]): result for result in baseline["results"]}
+    regressions = []
+
+    for result in report["results"]:
+        previous = baseline_results.get((result["case"], result["slides"]))
+        if previous is None:
+            continue
+        for metric in ("seconds", "peak_rss_kb", "output_bytes"):
+            if previous.get(metric) and result.get(metric) is not None:
+                change = result[metric] / previous[metric] - 1
+                result.setdefault("change", {})[metric] = change
+                if change > tolerance:
+                    regressions.append(f"{result['case']} ({result['slides']} slides): {metric} "
+                                       f"{previous[metric]:.6g} -> {result[metric]:.6g} (+{change:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--template", default=DEFAULT_TEMPLATE, help="template deck to build on")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="synthetic deck sizes (slides)")
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=list(CASES), help="cases to run")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per case, the fastest is reported")
+    parser.add_argument("--workdir", help="keep generated decks in this directory")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--baseline", help="compare against this JSON report")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    if args.workdir:
+        os.makedirs(args.workdir, exist_ok=True)
+
+    report = run_benchmarks(args.template, args.sizes, args.cases, args.repeat, args.workdir)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare_to_baseline(report, json.load(baseline_file), args.tolerance)
+
+    output = json.dumps(report, indent=4)
+    if args.output:
+        with open(args.output, "w") as output_file:
+            output_file.write(output)
+    else:
+        print(output)
+
+    for regression in regressions:
+        print(f"REGRESSION: {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import threading
+import time
+
+
+class DiskCache:
+    """
+    Persistent key -> bytes cache stored in a SQLite file, with size-based LRU eviction.
+
+    The cache can be shared by several processes; SQLite takes care of the locking.
+    """
+    def __init__(self, path, max_bytes=256 * 1024 * 1024):
+        """
+        Open (or create) a cache file.
+
+        :param path: Path of the SQLite file holding the cache
+        :param max_bytes: Maximum total size of the cached values, least recently used entries
+                          are evicted once it is exceeded
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def get(self, key):
+        """
+        Return the value stored for a key, or None if it is not cached.
+
+        :param key: Cache key
+        :return: The cached bytes or None
+        """
+        with self._lock, self._connection:
+            row = self._connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._connection.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entries if the cache grows too big.
+
+        :param key: Cache key
+        :param value: Bytes to store
+        """
+        if len(value) > self.max_bytes:
+            return
+
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(value), len(value), time.time())
+            )
+            self._evict()
+
+    def __contains__(self, key):
+        with self._lock:
+            row = self._connection.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @property
+    def total_bytes(self):
+        """
+        Total size of the cached values.
+        """
+        with self._lock:
+            return self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def clear(self):
+        """
+        Remove every entry from the cache.
+        """
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM entries")
+
+    def close(self):
+        """
+        Close the underlying SQLite connection.
+        """
+        with self._lock:
+            self._connection.close()
+
+    def _evict(self):
+        total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # Walk entries from the least recently used and drop them until the cache fits again
+        to_delete = []
+        for key, size in self._connection.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            to_delete.append((key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self._connection.executemany("DELETE FROM entries WHERE key = ?", to_delete)
@@ -0,0 +1,98 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+class StageExecutor:
+    """
+    Run blocking stages (loading, QR encoding, slide building, saving, OCR) off the event loop.
+
+    Calls run on a bounded thread pool, and each stage has its own concurrency limit so one
+    busy stage (e.g. OCR of a large deck) cannot take every worker and hold up the other
+    requests. Callers wait for a free slot of their stage before their call is queued, which
+    gives backpressure instead of an unbounded backlog in the pool.
+
+    Cancelling a caller drops its call if it has not started yet. A call that already started
+    cannot be interrupted: it runs to completion, and its stage slot (and lock, if any) is
+    only given back once it is done.
+    """
+    def __init__(self, max_workers=None, stage_limits=None):
+        """
+        Initialize the executor.
+
+        :param max_workers: Number of worker threads, defaults to one per CPU plus four
+        :param stage_limits: Optional dict of stage name -> maximum concurrent calls; stages not
+                             listed may use half of the workers
+        """
+        self.max_workers = max_workers or (os.cpu_count() or 1) + 4
+        self.stage_limits = dict(stage_limits or {})
+        self.default_stage_limit = max(1, self.max_workers // 2)
+
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="stage")
+        self._semaphores = {}
+
+    async def run(self, stage, function, *args, lock=None, **kwargs):
+        """
+        Run a blocking function on the pool.
+
+        :param stage: Name of the stage the call is counted against
+        :param function: The function to call
+        :param lock: Optional asyncio.Lock held for the duration of the call, e.g. to serialize
+                     the calls on one object
+        :return: The result of the function
+        """
+        semaphore = self._semaphore(stage)
+        await semaphore.acquire()
+        if lock is not None:
+            try:
+                await lock.acquire()
+            except BaseException:
+                semaphore.release()
+                raise
+
+        def release(done):
+            # Mark a failure as retrieved, in case the caller was cancelled and never sees it
+            if not done.cancelled():
+                done.exception()
+            if lock is not None:
+                lock.release()
+            semaphore.release()
+
+        try:
+            future = self._executor.submit(functools.partial(function, *args, **kwargs))
+        except BaseException:
+            if lock is not None:
+                lock.release()
+            semaphore.release()
+            raise
+
+        # Release the slot when the call is really finished, not when the caller stops waiting
+        wrapped = asyncio.wrap_future(future)
+        wrapped.add_done_callback(release)
+        try:
+            return await asyncio.shield(wrapped)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+
+    def close(self, wait=True):
+        """
+        Shut down the worker threads.
+
+        :param wait: Wait for the running calls to finish
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
+
+    def _semaphore(self, stage):
+        semaphore = self._semaphores.get(stage)
+        if semaphore is None:
+            semaphore = self._semaphores[stage] = asyncio.Semaphore(
+                self.stage_limits.get(stage, self.default_stage_limit))
+        return semaphore
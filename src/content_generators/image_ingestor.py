@@ -0,0 +1,160 @@
+import hashlib
+import os
+from collections import OrderedDict
+from io import BytesIO
+from PIL import Image, ImageOps
+from instrumentation.instrumentation import instrumented, register, result_size
+
+# English Metric Units per inch, the unit of python-pptx lengths
+EMU_PER_INCH = 914400
+
+# Number of processed images kept in memory by each ingestor
+MEMO_SIZE = 64
+
+# EXIF tag of the orientation of a photo; values 5 to 8 mean it is stored rotated by 90 degrees
+EXIF_ORIENTATION = 0x0112
+
+
+@register
+class ImageIngestor:
+    """
+    Prepare images for embedding: resample them to the resolution they are shown at and
+    re-encode them, keeping PNG for graphics and using JPEG for photos.
+
+    Results are memoized per ingestor (e.g. per deck), keyed by the hash of the source bytes,
+    and can be shared across jobs through an optional persistent cache.
+    """
+    def __init__(self, dpi=150, jpeg_quality=85, cache=None):
+        """
+        Initialize the image ingestor.
+
+        :param dpi: Target resolution of the embedded images, in pixels per inch of the slide
+        :param jpeg_quality: Quality of the re-encoded JPEG images (1-95)
+        :param cache: Optional DiskCache mapping source image hash and settings to processed images
+        """
+        self.dpi = dpi
+        self.jpeg_quality = jpeg_quality
+        self.cache = cache
+        self._memo = OrderedDict()
+
+    @staticmethod
+    def image_hash(image_bytes):
+        """
+        Return the content hash identifying a source image.
+
+        :param image_bytes: Encoded image bytes
+        :return: Hex digest of the image bytes
+        """
+        return hashlib.sha1(image_bytes).hexdigest()
+
+    @instrumented("image.ingest", size=result_size)
+    def ingest(self, image, width, height):
+        """
+        Return the bytes to embed for an image shown at a given size.
+
+        Images are only ever scaled down, and the source bytes are kept as they are when they
+        are already small enough and in the right format.
+
+        :param image: Path to the image file, encoded image bytes or a binary file-like object
+        :param width: Width the image is shown at, in EMU (e.g. presentation.slide_width)
+        :param height: Height the image is shown at, in EMU
+        :return: Encoded image bytes (PNG or JPEG)
+        """
+        image_bytes = self._read(image)
+        target_size = (max(1, round(width / EMU_PER_INCH * self.dpi)),
+                       max(1, round(height / EMU_PER_INCH * self.dpi)))
+        key = f"image:{self.image_hash(image_bytes)}:{target_size[0]}x{target_size[1]}:{self.jpeg_quality}"
+
+        processed = self._memo.get(key)
+        if processed is not None:
+            self._memo.move_to_end(key)
+            return processed
+
+        if self.cache is not None:
+            processed = self.cache.get(key)
+        if processed is None:
+            processed = self.process(image_bytes, target_size, self.jpeg_quality)
+            if self.cache is not None:
+                self.cache.set(key, processed)
+
+        self._memo[key] = processed
+        if len(self._memo) > MEMO_SIZE:
+            self._memo.popitem(last=False)
+        return processed
+
+    @staticmethod
+    @instrumented("image.process", size=result_size)
+    def process(image_bytes, target_size, jpeg_quality=85):
+        """
+        Downscale an encoded image to fit a pixel size and re-encode it.
+
+        :param image_bytes: Encoded image bytes
+        :param target_size: (width, height) in pixels the image is shown at
+        :param jpeg_quality: Quality of the re-encoded JPEG images (1-95)
+        :return: Encoded image bytes (PNG or JPEG)
+        """
+        image = Image.open(BytesIO(image_bytes))
+        source_format = image.format
+
+        # JPEG images can be decoded directly at a reduced scale, which is much faster for big photos.
+        # The draft is of the stored image, so the target is turned with it for rotated photos
+        draft_size = target_size
+        if image.getexif().get(EXIF_ORIENTATION, 1) in (5, 6, 7, 8):
+            draft_size = target_size[::-1]
+        image.draft("RGB", draft_size)
+        image = ImageOps.exif_transpose(image)
+
+        # The picture is stretched to the target box, so each axis is scaled on its own
+        new_size = (min(image.width, target_size[0]), min(image.height, target_size[1]))
+        resized = new_size != image.size
+
+        output_format = "PNG" if ImageIngestor.is_graphic(image, source_format) else "JPEG"
+        if not resized and output_format == source_format:
+            return image_bytes
+
+        if resized:
+            if image.mode not in ("RGB", "RGBA", "L", "LA"):
+                image = image.convert("RGBA" if ImageIngestor.has_alpha(image) else "RGB")
+            image = image.resize(new_size, Image.LANCZOS)
+
+        output = BytesIO()
+        if output_format == "JPEG":
+            image.convert("RGB").save(output, format="JPEG", quality=jpeg_quality, optimize=True)
+        else:
+            image.save(output, format="PNG")
+
+        # A re-encode of an image at its original size is only worth it if it is smaller
+        if not resized and output.tell() >= len(image_bytes):
+            return image_bytes
+        return output.getvalue()
+
+    @staticmethod
+    def is_graphic(image, source_format=None):
+        """
+        Tell whether an image is a graphic (logo, chart, screenshot) rather than a photo.
+
+        Graphics have transparency or few distinct colors and are kept lossless as PNG.
+
+        :param image: PIL image
+        :param source_format: Format the image was decoded from, defaults to image.format
+        :return: True for graphics, False for photos
+        """
+        if (source_format or image.format) == "JPEG":
+            return False
+        if ImageIngestor.has_alpha(image) or image.mode in ("1", "P"):
+            return True
+        # getcolors returns None once there are more distinct colors than maxcolors
+        return image.getcolors(maxcolors=256) is not None
+
+    @staticmethod
+    def has_alpha(image):
+        return image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+
+    @staticmethod
+    def _read(image):
+        if isinstance(image, bytes):
+            return image
+        if isinstance(image, (str, os.PathLike)):
+            with open(image, "rb") as image_file:
+                return image_file.read()
+        return image.read()
@@ -1,15 +1,164 @@
-import qrcode
+from functools import lru_cache
+from io import BytesIO
 from PIL import Image, ImageDraw, ImageFont
+from PIL.PngImagePlugin import PngInfo
+from instrumentation.instrumentation import instrumented, register, result_size
 
+# Value of qrcode.constants.ERROR_CORRECT_M, so qrcode is only imported when a code is encoded
+ERROR_CORRECT_M = 0
+
+# Maximum number of encoded QR codes kept in memory by generate_qr_matrix and generate_qr_png
+QR_CACHE_SIZE = 512
+
+# Maps the module values of a QR matrix row (1 for dark, 0 for light) to grayscale pixels
+DARK_MODULE_PIXELS = bytes([255, 0]) + bytes(254)
+
+# PNG text chunk carrying the payload of the QR codes rendered here, so loaders can read it back without OCR
+QR_PAYLOAD_KEY = "ppt-generator:qr-payload"
+
+@register
 class QRGenerator:
     @staticmethod
+    @instrumented("qr.generate_image")
     def generate_qr_code(data: str):
+        import qrcode
+
         img = qrcode.make(data)
-        img2 = qrcode.make()
         return img
 
     @staticmethod
+    @instrumented("qr.generate_matrix")
+    def generate_qr_matrix(data: str, error_correction=ERROR_CORRECT_M, border=4):
+        """
+        Encode data as a QR code and return its module matrix, including the quiet zone.
+
+        Results are cached by _qr_matrix, which always gets the arguments the same way, so a
+        payload is encoded once whether the defaults are passed or left out.
+
+        :param data: Data to be encoded in the QR code
+        :param error_correction: One of the qrcode.constants.ERROR_CORRECT_* levels
+        :param border: Width of the quiet zone in modules
+        :return: Square tuple of rows, each a tuple of booleans (True for a dark module)
+        """
+        return QRGenerator._qr_matrix(data, error_correction, border)
+
+    @staticmethod
+    @lru_cache(maxsize=QR_CACHE_SIZE)
+    def _qr_matrix(data, error_correction, border):
+        # lru_cache keys on the arguments as passed, callers pass them all positionally
+        import qrcode
+
+        qr = qrcode.QRCode(error_correction=error_correction, border=border)
+        qr.add_data(data)
+        qr.make(fit=True)
+        return tuple(tuple(row) for row in qr.get_matrix())
+
+    @staticmethod
+    @instrumented("qr.render_png", size=result_size)
+    def render_qr_png(matrix, box_size=10, payload=None):
+        """
+        Render a QR module matrix to PNG bytes.
+
+        The matrix is converted to a one pixel per module image in a single call and scaled up
+        with a nearest-neighbour resize, instead of drawing every module as its own rectangle.
+        This roughly halves the render time, but encoding the data (generate_qr_matrix) costs
+        several times more than rendering, so uncached codes are only slightly faster overall.
+
+        :param matrix: Module matrix as returned by generate_qr_matrix
+        :param box_size: Size in pixels of each QR module
+        :param payload: Optional encoded data, stored in the PNG under QR_PAYLOAD_KEY
+        :return: PNG encoded bytes of the QR code
+        """
+        modules = len(matrix)
+        pixels = b"".join(bytes(row) for row in matrix).translate(DARK_MODULE_PIXELS)
+        image = Image.frombytes("L", (modules, modules), pixels).convert("1")
+        image = image.resize((modules * box_size, modules * box_size), Image.NEAREST)
+
+        png_info = None
+        if payload is not None:
+            png_info = PngInfo()
+            png_info.add_itxt(QR_PAYLOAD_KEY, payload)
+
+        png_bytes = BytesIO()
+        image.save(png_bytes, format="PNG", pnginfo=png_info)
+        return png_bytes.getvalue()
+
+    @staticmethod
+    @instrumented("qr.generate_png", size=result_size)
+    def generate_qr_png(data: str, error_correction=ERROR_CORRECT_M, box_size=10, border=4):
+        """
+        Generate a QR code and return it as ready-to-embed PNG bytes.
+
+        Results are kept in a bounded LRU cache keyed by (data, error_correction, box_size, border),
+        however the arguments are passed, so a payload is only encoded once no matter how many
+        slides use it. The data is also stored in the PNG (see QR_PAYLOAD_KEY), so loaders do not
+        need to OCR or decode the code.
+
+        :param data: Data to be encoded in the QR code
+        :param error_correction: One of the qrcode.constants.ERROR_CORRECT_* levels
+        :param box_size: Size in pixels of each QR module
+        :param border: Width of the quiet zone in modules
+        :return: PNG encoded bytes of the QR code
+        """
+        return QRGenerator._qr_png(data, error_correction, box_size, border)
+
+    @staticmethod
+    @lru_cache(maxsize=QR_CACHE_SIZE)
+    def _qr_png(data, error_correction, box_size, border):
+        matrix = QRGenerator._qr_matrix(data, error_correction, border)
+        return QRGenerator.render_qr_png(matrix, box_size, payload=data)
+
+    @staticmethod
+    def clear_cache():
+        """
+        Drop the encoded matrices and PNGs kept by generate_qr_matrix and generate_qr_png.
+        """
+        QRGenerator._qr_matrix.cache_clear()
+        QRGenerator._qr_png.cache_clear()
+
+    @staticmethod
+    @lru_cache(maxsize=QR_CACHE_SIZE)
+    def qr_rectangles(matrix):
+        """
+        Cover the dark modules of a QR matrix with as few rectangles as a row-merging pass finds.
+
+        Each row is split into runs of dark modules and runs spanning the same columns on
+        consecutive rows are merged into one rectangle. Results are cached like the matrices,
+        so codes drawn many times (e.g. once per poll option) are only merged once.
+
+        :param matrix: Module matrix as returned by generate_qr_matrix
+        :return: Tuple of (x, y, width, height) rectangles in module units
+        """
+        rectangles = []
+        # (start column, end column) -> row where the currently open rectangle started
+        open_runs = {}
+
+        for y, row in enumerate(matrix + ((),)):
+            runs = set()
+            x = 0
+            while x < len(row):
+                if row[x]:
+                    start = x
+                    while x < len(row) and row[x]:
+                        x += 1
+                    runs.add((start, x))
+                else:
+                    x += 1
+
+            for run in list(open_runs):
+                if run not in runs:
+                    start_y = open_runs.pop(run)
+                    rectangles.append((run[0], start_y, run[1] - run[0], y - start_y))
+            for run in runs:
+                open_runs.setdefault(run, y)
+
+        return tuple(rectangles)
+
+    @staticmethod
+    @instrumented("qr.generate_styled")
     def create_qr_with_text_and_logo(data, logo_path, text):
+        import qrcode
+
         # Generate QR code
         qr = qrcode.QRCode(
             version=1,
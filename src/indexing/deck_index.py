@@ -0,0 +1,241 @@
+import hashlib
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from loaders.notes_reader import NotesReader
+from loaders.pptx_loader import PPTXLoader
+from instrumentation.instrumentation import instrumented, register
+
+# Words are runs of letters and digits, compared case-insensitively
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# BM25 parameters: term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text):
+    """
+    Split text into lowercase index terms.
+
+    :param text: Text to split
+    :return: List of terms
+    """
+    return [token.casefold() for token in TOKEN_PATTERN.findall(text or "")]
+
+
+@register
+class DeckIndex:
+    """
+    Persistent inverted index of the words on the slides of many decks, stored in a SQLite file.
+
+    Each slide is indexed with the text of its shapes, its notes and the OCR text of its
+    images, as extracted by PPTXLoader. Decks are keyed by path and content hash: adding a deck
+    that did not change since it was indexed is skipped, and a changed deck replaces its
+    previous entries. Queries are ranked with BM25.
+    """
+    def __init__(self, path, ocr_stage=None):
+        """
+        Open (or create) an index file.
+
+        :param path: Path of the SQLite file holding the index
+        :param ocr_stage: Optional OCRStage interpreting the images of the indexed decks (e.g. one
+                          with a DiskCache), defaults to serial OCR
+        """
+        self.path = path
+        self.ocr_stage = ocr_stage
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self._connection:
+            self._connection.executescript(
+                "CREATE TABLE IF NOT EXISTS decks ("
+                "deck_id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, sha256 TEXT NOT NULL, "
+                "slide_count INTEGER NOT NULL, total_length INTEGER NOT NULL, indexed REAL NOT NULL);"
+                "CREATE TABLE IF NOT EXISTS slides ("
+                "slide_key INTEGER PRIMARY KEY, deck_id INTEGER NOT NULL, number INTEGER NOT NULL, "
+                "length INTEGER NOT NULL);"
+                "CREATE INDEX IF NOT EXISTS slides_deck ON slides (deck_id);"
+                "CREATE TABLE IF NOT EXISTS postings ("
+                "term TEXT NOT NULL, slide_key INTEGER NOT NULL, tf INTEGER NOT NULL, "
+                "PRIMARY KEY (term, slide_key)) WITHOUT ROWID;"
+                "CREATE INDEX IF NOT EXISTS postings_slide ON postings (slide_key);"
+            )
+
+    @staticmethod
+    def file_hash(path):
+        """
+        Return the SHA256 of a file's content.
+
+        :param path: Path of the file
+        :return: Hex digest of the file
+        """
+        sha256 = hashlib.sha256()
+        with open(path, "rb") as deck_file:
+            for chunk in iter(lambda: deck_file.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    @instrumented("deck_index.add_deck")
+    def add_deck(self, pptx_file):
+        """
+        Index a deck, unless it is already indexed with the same content.
+
+        :param pptx_file: Path to the PowerPoint file
+        :return: True if the deck was (re)indexed, False if it was unchanged
+        """
+        path = os.path.realpath(pptx_file)
+        sha256 = self.file_hash(path)
+
+        with self._lock:
+            row = self._connection.execute("SELECT sha256 FROM decks WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[0] == sha256:
+            return False
+
+        # Extract outside of the lock, OCR can take a while
+        slides = self._extract_slides(path)
+
+        with self._lock, self._connection:
+            self._remove(path)
+            cursor = self._connection.execute(
+                "INSERT INTO decks (path, sha256, slide_count, total_length, indexed) VALUES (?, ?, ?, ?, ?)",
+                (path, sha256, len(slides), sum(len(terms) for _, terms in slides), time.time())
+            )
+            deck_id = cursor.lastrowid
+
+            for number, terms in slides:
+                cursor = self._connection.execute(
+                    "INSERT INTO slides (deck_id, number, length) VALUES (?, ?, ?)", (deck_id, number, len(terms))
+                )
+                slide_key = cursor.lastrowid
+                self._connection.executemany(
+                    "INSERT INTO postings (term, slide_key, tf) VALUES (?, ?, ?)",
+                    [(term, slide_key, tf) for term, tf in Counter(terms).items()]
+                )
+        return True
+
+    def update(self, pptx_files):
+        """
+        Index a set of decks, skipping the unchanged ones.
+
+        :param pptx_files: Paths to the PowerPoint files
+        :return: Number of decks that were (re)indexed
+        """
+        return sum(1 for pptx_file in pptx_files if self.add_deck(pptx_file))
+
+    def remove_deck(self, pptx_file):
+        """
+        Drop a deck from the index.
+
+        :param pptx_file: Path to the PowerPoint file
+        :return: True if the deck was indexed
+        """
+        with self._lock, self._connection:
+            return self._remove(os.path.realpath(pptx_file))
+
+    def prune(self):
+        """
+        Drop the decks whose file no longer exists.
+
+        :return: Number of decks dropped
+        """
+        with self._lock:
+            paths = [row[0] for row in self._connection.execute("SELECT path FROM decks")]
+        missing = [path for path in paths if not os.path.exists(path)]
+        with self._lock, self._connection:
+            for path in missing:
+                self._remove(path)
+        return len(missing)
+
+    @instrumented("deck_index.search")
+    def search(self, query, limit=10):
+        """
+        Find the slides best matching a query.
+
+        :param query: Words to look for
+        :param limit: Maximum number of results
+        :return: List of {"path", "slide", "score"} dicts, best match first
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            # Corpus statistics are kept per deck, so they are cheap to sum up
+            slide_count, total_length = self._connection.execute(
+                "SELECT COALESCE(SUM(slide_count), 0), COALESCE(SUM(total_length), 0) FROM decks").fetchone()
+            if not slide_count:
+                return []
+            average_length = total_length / slide_count or 1
+
+            scores = Counter()
+            for term in terms:
+                postings = self._connection.execute(
+                    "SELECT postings.slide_key, postings.tf, slides.length FROM postings "
+                    "JOIN slides ON slides.slide_key = postings.slide_key WHERE postings.term = ?", (term,)
+                ).fetchall()
+                if not postings:
+                    continue
+
+                idf = math.log(1 + (slide_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for slide_key, tf, length in postings:
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+                    scores[slide_key] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+            best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+            results = []
+            for slide_key, score in best:
+                path, number = self._connection.execute(
+                    "SELECT decks.path, slides.number FROM slides JOIN decks ON decks.deck_id = slides.deck_id "
+                    "WHERE slides.slide_key = ?", (slide_key,)
+                ).fetchone()
+                results.append({"path": path, "slide": number, "score": score})
+        return results
+
+    def __contains__(self, pptx_file):
+        with self._lock:
+            row = self._connection.execute("SELECT 1 FROM decks WHERE path = ?",
+                                           (os.path.realpath(pptx_file),)).fetchone()
+        return row is not None
+
+    def __len__(self):
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM decks").fetchone()[0]
+
+    def close(self):
+        """
+        Close the underlying SQLite connection.
+        """
+        with self._lock:
+            self._connection.close()
+
+    def _extract_slides(self, path):
+        # Slide text and OCR text from the loader, notes straight from the zip
+        notes = {number: notes_text for number, _, notes_text in NotesReader(path).iter_notes()}
+        loader = PPTXLoader(path, ocr_stage=self.ocr_stage)
+
+        slides = []
+        for slide_content in loader.iter_slides():
+            number = slide_content["slide"]
+            text = " ".join([slide_content["text"], notes.get(number) or ""] + slide_content["images"])
+            slides.append((number, tokenize(text)))
+        return slides
+
+    def _remove(self, path):
+        row = self._connection.execute("SELECT deck_id FROM decks WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return False
+        deck_id = row[0]
+        self._connection.execute(
+            "DELETE FROM postings WHERE slide_key IN (SELECT slide_key FROM slides WHERE deck_id = ?)", (deck_id,))
+        self._connection.execute("DELETE FROM slides WHERE deck_id = ?", (deck_id,))
+        self._connection.execute("DELETE FROM decks WHERE deck_id = ?", (deck_id,))
+        return True
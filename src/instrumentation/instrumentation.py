@@ -0,0 +1,271 @@
+"""
+Opt-in per-stage timers, counters and byte sizes for the builder, loader and QR generator.
+
+Functions are marked with @instrumented("stage.name") and their classes with @register.
+Marking does not wrap anything: the timing wrappers are only installed by enable() and are
+removed again by disable(), so instrumentation costs nothing while it is disabled.
+
+    from instrumentation.instrumentation import MemorySink, enable, disable
+
+    sink = MemorySink()
+    enable(sink)
+    ...  # build or load decks
+    disable()
+    print(sink.snapshot())
+"""
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# (owner class, attribute name, stage name, size function) of every instrumented function
+_registry = []
+
+# (owner class, attribute name) -> original attribute, while instrumentation is enabled
+_originals = {}
+
+_sink = None
+
+
+def instrumented(stage, size=None):
+    """
+    Mark a function or method as an instrumented stage.
+
+    :param stage: Name of the stage, e.g. "qr.generate_png"
+    :param size: Optional function called with (result, *args, **kwargs) returning the number of
+                 bytes produced or consumed by the call
+    :return: Decorator returning the function unchanged
+    """
+    def decorator(function):
+        function.__instrumented_stage__ = (stage, size)
+        return function
+    return decorator
+
+
+def register(cls):
+    """
+    Class decorator registering the instrumented methods of a class.
+
+    :param cls: The class to register
+    :return: The class unchanged
+    """
+    for name, attribute in vars(cls).items():
+        function = attribute.__func__ if isinstance(attribute, (staticmethod, classmethod)) else attribute
+        marker = getattr(function, "__instrumented_stage__", None)
+        if marker is not None:
+            _registry.append((cls, name) + marker)
+    return cls
+
+
+def result_size(result, *args, **kwargs):
+    """
+    Size function for stages returning bytes or str.
+    """
+    return len(result)
+
+
+def output_file_size(result, self, output_file, *args, **kwargs):
+    """
+    Size function for save-like methods taking a path or a file-like object as first argument.
+    """
+    if hasattr(output_file, "tell"):
+        return output_file.tell()
+    return os.path.getsize(output_file)
+
+
+def enable(sink):
+    """
+    Install the timing wrappers and send every stage record to a sink.
+
+    :param sink: A LogSink, MemorySink, PrometheusTextSink or any object with a
+                 record(stage, seconds, size) method
+    """
+    global _sink
+    _sink = sink
+
+    for cls, name, stage, size in _registry:
+        if (cls, name) in _originals:
+            continue
+        attribute = vars(cls)[name]
+        _originals[(cls, name)] = attribute
+
+        if isinstance(attribute, staticmethod):
+            setattr(cls, name, staticmethod(_wrap(attribute.__func__, stage, size)))
+        elif isinstance(attribute, classmethod):
+            setattr(cls, name, classmethod(_wrap(attribute.__func__, stage, size)))
+        else:
+            setattr(cls, name, _wrap(attribute, stage, size))
+
+
+def disable():
+    """
+    Remove the timing wrappers, restoring the original functions.
+    """
+    global _sink
+    for (cls, name), attribute in _originals.items():
+        setattr(cls, name, attribute)
+    _originals.clear()
+    _sink = None
+
+
+def is_enabled():
+    return _sink is not None
+
+
+def _wrap(function, stage, size):
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        result = function(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        sink = _sink
+        if sink is not None:
+            nbytes = None
+            if size is not None:
+                try:
+                    nbytes = size(result, *args, **kwargs)
+                except (TypeError, OSError):
+                    nbytes = None
+            sink.record(stage, elapsed, nbytes)
+        return result
+
+    # Keep helpers like lru_cache's cache_info/cache_clear reachable while wrapped
+    for helper in ("cache_info", "cache_clear"):
+        if hasattr(function, helper):
+            setattr(wrapper, helper, getattr(function, helper))
+    return wrapper
+
+
+class LogSink:
+    """
+    Log one line per stage call.
+    """
+    def __init__(self, log=None, level=logging.INFO):
+        self.log = log or logger
+        self.level = level
+
+    def record(self, stage, seconds, size=None):
+        self.log.log(self.level, "stage=%s seconds=%.6f bytes=%s", stage, seconds, size)
+
+
+class MemorySink:
+    """
+    Aggregate call count, total and max time and bytes per stage in memory.
+    """
+    def __init__(self):
+        self._stages = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, size=None):
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = self._stages[stage] = {"count": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes": 0}
+            stats["count"] += 1
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            if size:
+                stats["bytes"] += size
+
+    def snapshot(self):
+        """
+        Return a copy of the aggregated statistics, {stage: {count, seconds, max_seconds, bytes}}.
+        """
+        with self._lock:
+            return {stage: dict(stats) for stage, stats in self._stages.items()}
+
+    def reset(self):
+        with self._lock:
+            self._stages.clear()
+
+
+class PrometheusTextSink(MemorySink):
+    """
+    Aggregate stage statistics and write them as a Prometheus text exposition file, e.g. for the
+    node exporter's textfile collector.
+    """
+    def __init__(self, path, prefix="ppt_generator"):
+        """
+        :param path: Path of the .prom file written by flush()
+        :param prefix: Prefix of the metric names
+        """
+        super().__init__()
+        self.path = path
+        self.prefix = prefix
+
+    def flush(self):
+        """
+        Write the current statistics to the file, replacing it atomically.
+        """
+        metrics = [
+            ("stage_calls_total", "counter", "Number of calls of each stage", "count"),
+            ("stage_seconds_total", "counter", "Total time spent in each stage", "seconds"),
+            ("stage_max_seconds", "gauge", "Slowest call of each stage", "max_seconds"),
+            ("stage_bytes_total", "counter", "Bytes produced or consumed by each stage", "bytes"),
+        ]
+        stages = self.snapshot()
+
+        lines = []
+        for name, metric_type, description, field in metrics:
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {metric_type}")
+            for stage in sorted(stages):
+                lines.append(f'{metric}{{stage="{stage}"}} {stages[stage][field]}')
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile("w", dir=directory, delete=False, suffix=".tmp") as prom_file:
+            prom_file.write("\n".join(lines) + "\n")
+        os.replace(prom_file.name, self.path)
+
+
+@contextmanager
+def profile_request(output_prefix, memory=True, top=50):
+    """
+    Capture a cProfile profile (and optionally a tracemalloc snapshot) of a single request.
+
+    Writes <output_prefix>.prof, loadable with pstats or snakeviz, and
+    <output_prefix>.memory.txt with the top allocation sites.
+
+    :param output_prefix: Path prefix of the output files
+    :param memory: Also trace memory allocations (slows the request down noticeably)
+    :param top: Number of allocation sites listed in the memory report
+    """
+    started_tracemalloc = memory and not tracemalloc.is_tracing()
+    if started_tracemalloc:
+        tracemalloc.start()
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(output_prefix + ".prof")
+
+        if memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            if started_tracemalloc:
+                tracemalloc.stop()
+
+            report = io.StringIO()
+            report.write(f"current={current} peak={peak}\n")
+            for statistic in snapshot.statistics("lineno")[:top]:
+                report.write(f"{statistic}\n")
+            with open(output_prefix + ".memory.txt", "w") as memory_file:
+                memory_file.write(report.getvalue())
+
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(20)
+        logger.debug("Profile of %s:\n%s", output_prefix, summary.getvalue())
@@ -0,0 +1,80 @@
+import asyncio
+from loaders.pptx_loader import PPTXLoader
+
+# Marks the end of the slide generator when it is advanced on the executor
+_END = object()
+
+
+class AsyncPPTXLoader:
+    """
+    asyncio front-end for PPTXLoader.
+
+    Loading runs on a StageExecutor under the "load" stage, notes and metadata extraction under
+    "notes" and slide content extraction (including OCR) under "ocr". Calls on the same loader
+    are serialized by a per-loader lock.
+    """
+    def __init__(self, loader, stages):
+        """
+        Wrap an existing PPTXLoader, see open() to load one without blocking.
+
+        :param loader: The PPTXLoader to drive
+        :param stages: The StageExecutor running the blocking calls
+        """
+        self.loader = loader
+        self.stages = stages
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, pptx_file, stages, template_pool=None, ocr_stage=None):
+        """
+        Load a PowerPoint file on the executor.
+
+        :param pptx_file: Path to the PowerPoint file, or a file-like object
+        :param stages: The StageExecutor running the blocking calls
+        :param template_pool: Optional TemplatePool to take a parsed copy of the file from
+        :param ocr_stage: Optional OCRStage used to interpret the images
+        :return: An AsyncPPTXLoader
+        """
+        loader = await stages.run("load", PPTXLoader, pptx_file, template_pool, ocr_stage)
+        return cls(loader, stages)
+
+    async def call(self, stage, method, *args, **kwargs):
+        """
+        Call any PPTXLoader method on the executor, under the loader's lock.
+
+        :param stage: Name of the stage the call is counted against
+        :param method: Name of the PPTXLoader method
+        :return: The result of the method
+        """
+        return await self.stages.run(stage, getattr(self.loader, method), *args, lock=self._lock, **kwargs)
+
+    async def get_pptx_content(self):
+        return await self.call("ocr", "get_pptx_content")
+
+    async def extract_notes_after_delimiter_for_all_slides(self, delimiter):
+        return await self.call("notes", "extract_notes_after_delimiter_for_all_slides", delimiter)
+
+    async def build_metadata_index(self, start_delimiter="###", end_delimiter="###"):
+        return await self.call("notes", "build_metadata_index", start_delimiter, end_delimiter)
+
+    async def iter_slides(self, window=None):
+        """
+        Asynchronously yield the content of each slide, see PPTXLoader.iter_slides.
+
+        Each window of slides is processed on the executor, so the event loop only waits while
+        the consumer is ready for the next record.
+
+        :param window: Number of slides OCR'd together
+        :return: Async generator of {"slide": number, "text": text, "images": [descriptions]} records
+        """
+        slides = self.loader.iter_slides(window)
+        try:
+            while True:
+                slide_content = await self.stages.run("ocr", next, slides, _END, lock=self._lock)
+                if slide_content is _END:
+                    break
+                yield slide_content
+        finally:
+            # Closing must not race a next() still running on the executor
+            async with self._lock:
+                slides.close()
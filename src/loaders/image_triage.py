@@ -0,0 +1,178 @@
+import hashlib
+import io
+import json
+from PIL import Image
+from content_generators.qr_generator import QR_PAYLOAD_KEY
+from instrumentation.instrumentation import instrumented, register
+
+# Images with a side shorter than this many pixels are too small to hold readable text
+MIN_IMAGE_SIDE = 16
+
+# Pixels further than this from the dominant gray level of an image count as ink
+INK_CONTRAST = 48
+
+# Images with fewer ink pixels than this are considered blank or near-uniform
+MIN_INK_PIXELS = 24
+
+# Images are scaled down to this many pixels per side at most before looking for QR codes
+QR_DECODE_SIDE = 1024
+
+
+def qr_payload_text(data):
+    """
+    Return the text of a QR payload, unwrapping payloads that were encoded as JSON strings.
+
+    :param data: Decoded QR data
+    :return: The payload text, e.g. "engageli-op://{'op': 'PBM'}"
+    """
+    try:
+        payload = json.loads(data)
+    except ValueError:
+        return data
+    return payload if isinstance(payload, str) else data
+
+
+def triage_ocr(ocr_function, blob):
+    """
+    Run OCR on an image unless ImageTriage.inspect answers for it.
+
+    :param ocr_function: Function taking image bytes and returning the OCR text
+    :param blob: Encoded image bytes
+    :return: Text found in the image
+    """
+    text = ImageTriage.inspect(blob)
+    return ocr_function(blob) if text is None else text
+
+
+@register
+class ImageTriage:
+    """
+    Answer for the images that do not need OCR, before they are sent to tesseract.
+
+    classify answers from the hash and headers of an image, cheaply enough to run on every image
+    in the calling process, when it is:
+    - registered, e.g. an image the deck generator embedded itself, answered with its registered text;
+    - a QR code generated by QRGenerator, answered with its payload read from the PNG marker;
+    - tiny, answered with an empty text.
+
+    inspect decodes the image and answers when it is:
+    - blank or near-uniform, answered with an empty text;
+    - a QR code decoded with pyzbar, when it is installed, answered with its payloads.
+    OCRStage runs it in the OCR workers through triage_ocr, and caches its answers like OCR text.
+
+    Every other image still goes through OCR.
+    """
+    def __init__(self, registry=None):
+        """
+        Initialize the image triage.
+
+        :param registry: Optional DiskCache of registered image hashes, shared e.g. with the processes
+                         generating the decks; registrations are kept in memory otherwise
+        """
+        self.registry = registry
+        self._known = {}
+
+    @staticmethod
+    def image_hash(blob):
+        """
+        Return the key identifying a registered image, the same as OCRStage.image_hash.
+
+        :param blob: Encoded image bytes
+        :return: Hex digest of the image bytes
+        """
+        return hashlib.sha1(blob).hexdigest()
+
+    def register(self, blob, text=""):
+        """
+        Register an image whose text is known, so it is never OCR'd.
+
+        :param blob: Encoded image bytes
+        :param text: Text reported for the image
+        """
+        image_hash = self.image_hash(blob)
+        self._known[image_hash] = text
+        if self.registry is not None:
+            self.registry.set(self._registry_key(image_hash), text.encode("utf-8"))
+
+    @instrumented("ocr.triage")
+    def classify(self, blob, image_hash=None):
+        """
+        Answer for an image from its hash and headers, without decoding it.
+
+        :param blob: Encoded image bytes
+        :param image_hash: SHA1 of the image bytes, if already known
+        :return: The text of the image if it is registered, a generated QR code or tiny, None otherwise
+        """
+        image_hash = image_hash or self.image_hash(blob)
+        if image_hash in self._known:
+            return self._known[image_hash]
+        if self.registry is not None:
+            registered = self.registry.get(self._registry_key(image_hash))
+            if registered is not None:
+                return registered.decode("utf-8")
+
+        try:
+            # Opening only parses the headers, and the PNG text chunks before the image data
+            image = Image.open(io.BytesIO(blob))
+        except (OSError, SyntaxError):
+            # Leave images PIL cannot read to the OCR function
+            return None
+
+        payload = image.info.get(QR_PAYLOAD_KEY)
+        if payload is not None:
+            return qr_payload_text(payload)
+
+        if min(image.size) < MIN_IMAGE_SIDE:
+            return ""
+        return None
+
+    @staticmethod
+    @instrumented("ocr.inspect")
+    def inspect(blob):
+        """
+        Answer for an image by decoding it: blank and near-uniform images, and QR codes pyzbar reads.
+
+        :param blob: Encoded image bytes
+        :return: The text of the image if it could be found without OCR, None if it needs OCR
+        """
+        try:
+            # Same grayscale as the OCR function uses, so transparency is judged the way OCR sees it
+            image = Image.open(io.BytesIO(blob)).convert("L")
+        except (OSError, SyntaxError):
+            return None
+
+        # Counted on the histogram at full resolution, a thumbnail would blur small text away
+        histogram = image.histogram()
+        background = histogram.index(max(histogram))
+        ink = sum(histogram[:max(0, background - INK_CONTRAST)]) + sum(histogram[background + INK_CONTRAST + 1:])
+        if ink < MIN_INK_PIXELS:
+            return ""
+
+        payloads = ImageTriage.decode_qr(image)
+        if payloads:
+            return "\n".join(payloads)
+        return None
+
+    @staticmethod
+    def decode_qr(image):
+        """
+        Decode the QR codes in an image with pyzbar, if it is installed.
+
+        :param image: PIL image
+        :return: List of the payload texts found, empty if there are none or pyzbar is unavailable
+        """
+        try:
+            # Optional, it needs the zbar shared library
+            from pyzbar import pyzbar
+        except ImportError:
+            return []
+
+        image = image.convert("L")
+        if max(image.size) > QR_DECODE_SIDE:
+            image.thumbnail((QR_DECODE_SIDE, QR_DECODE_SIDE))
+        return [qr_payload_text(symbol.data.decode("utf-8", "replace"))
+                for symbol in pyzbar.decode(image, symbols=[pyzbar.ZBarSymbol.QRCODE])]
+
+    @staticmethod
+    def _registry_key(image_hash):
+        return f"triage:{image_hash}"
@@ -0,0 +1,174 @@
+import zipfile
+from lxml import etree
+from loaders.notes_reader import NS, SHAPE_TAGS, SP_TREE_TAG, NotesReader
+from loaders.ocr_stage import OCRStage
+from loaders.pptx_loader import PPTXLoader
+from loaders.slide_metadata import SlideMetadataIndex
+from instrumentation.instrumentation import instrumented, register
+
+RT_IMAGE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"
+
+SP_TAG = f"{{{NS['p']}}}sp"
+PIC_TAG = f"{{{NS['p']}}}pic"
+
+# Default cap on the image bytes held at once while extracting a deck
+DEFAULT_MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    """
+    Raised when a slide needs more memory for its images than the loader's budget allows.
+    """
+
+
+@register
+class LazyPPTXLoader(PPTXLoader):
+    """
+    Low-memory PPTXLoader reading the .pptx zip directly instead of building a Presentation.
+
+    Slide XML is parsed one slide at a time and discarded, and images are only read from the
+    zip when their window of slides is sent to OCR, then released. The number of image bytes
+    held at once is kept under a memory budget: windows are cut short when the next slide's
+    images would not fit, and a slide whose images alone exceed the budget raises
+    MemoryBudgetExceeded.
+
+    Extraction results are the same as PPTXLoader's; methods working on python-pptx slide
+    objects are not available, as no presentation is loaded.
+    """
+    @instrumented("lazy_loader.load")
+    def __init__(self, pptx_file, ocr_stage=None, memory_budget=DEFAULT_MEMORY_BUDGET):
+        """
+        Initialize the loader with a PowerPoint file; nothing is read until content is extracted.
+
+        :param pptx_file: Path to the PowerPoint file, or a seekable binary file-like object
+        :param ocr_stage: Optional OCRStage used to interpret the images, defaults to serial OCR
+        :param memory_budget: Maximum number of uncompressed image bytes held at once, None for no limit
+        """
+        self.pptx_file = pptx_file
+        self.presentation = None
+        self.ocr_stage = ocr_stage if ocr_stage is not None else OCRStage(workers=0)
+        self.memory_budget = memory_budget
+
+    def iter_slides(self, window=None):
+        """
+        Process the presentation one slide at a time and yield the content of each slide.
+
+        :param window: Maximum number of slides OCR'd together, defaults to the number of OCR workers
+        :return: Generator of {"slide": number, "text": text, "images": [descriptions]} records
+        """
+        if window is None:
+            window = max(1, self.ocr_stage.workers)
+
+        ocr_memo = {}
+        pending = []
+        pending_bytes = 0
+
+        with zipfile.ZipFile(self.pptx_file) as package:
+            names = set(package.namelist())
+            for number, (_, slide_name) in enumerate(NotesReader._iter_slide_parts(package, names), start=1):  # pylint: disable=protected-access
+                text, image_names = self._read_slide(package, names, slide_name)
+                slide_bytes = sum(package.getinfo(name).file_size for name in set(image_names))
+
+                if self.memory_budget is not None and slide_bytes > self.memory_budget:
+                    raise MemoryBudgetExceeded(
+                        f"Slide {number} holds {slide_bytes} bytes of images, over the budget of {self.memory_budget}")
+
+                # Flush the window early rather than going over the budget
+                if pending and self.memory_budget is not None and pending_bytes + slide_bytes > self.memory_budget:
+                    yield from self._interpret_window(package, pending, ocr_memo)
+                    pending, pending_bytes = [], 0
+
+                pending.append(({"slide": number, "text": text, "images": []}, image_names))
+                pending_bytes += slide_bytes
+
+                if len(pending) >= window:
+                    yield from self._interpret_window(package, pending, ocr_memo)
+                    pending, pending_bytes = [], 0
+
+            yield from self._interpret_window(package, pending, ocr_memo)
+
+    def open_media(self, name):
+        """
+        Open a member of the .pptx zip (e.g. "ppt/media/image1.png") as a stream.
+
+        :param name: Name of the zip member
+        :return: A context manager yielding a binary file-like object
+        """
+        package = zipfile.ZipFile(self.pptx_file)
+        try:
+            return _MediaStream(package, package.open(name))
+        except BaseException:
+            package.close()
+            raise
+
+    @instrumented("lazy_loader.extract_notes")
+    def extract_notes_after_delimiter_for_all_slides(self, delimiter):
+        return NotesReader(self.pptx_file).extract_notes_after_delimiter_for_all_slides(delimiter)
+
+    @instrumented("lazy_loader.build_metadata_index")
+    def build_metadata_index(self, start_delimiter="###", end_delimiter="###"):
+        return SlideMetadataIndex.from_pptx(self.pptx_file, start_delimiter, end_delimiter)
+
+    def _interpret_window(self, package, pending, ocr_memo):
+        # Read each distinct image of the window once, only now that it is needed
+        blobs = {}
+        for _, image_names in pending:
+            for name in image_names:
+                if name not in blobs:
+                    blobs[name] = package.read(name)
+
+        slides = [(slide_content, [blobs[name] for name in image_names]) for slide_content, image_names in pending]
+        blobs.clear()
+        return self._interpret_slide_images(slides, ocr_memo)
+
+    @staticmethod
+    def _read_slide(package, names, slide_name):
+        """
+        Return the text of a slide, as PPTXLoader.extract_text_from_slide, and the zip members
+        of its pictures, in shape order.
+        """
+        rels = None
+        texts = []
+        image_names = []
+
+        with package.open(slide_name) as slide_part:
+            for _, element in etree.iterparse(slide_part, tag=SHAPE_TAGS):
+                if element.getparent().tag != SP_TREE_TAG:
+                    continue
+
+                if element.tag == SP_TAG:
+                    texts.append(NotesReader._text_frame_text(element.find("p:txBody", NS)))  # pylint: disable=protected-access
+                elif element.tag == PIC_TAG and LazyPPTXLoader._is_plain_picture(element):
+                    blip = element.find("p:blipFill/a:blip", NS)
+                    rId = blip.get(f"{{{NS['r']}}}embed") if blip is not None else None
+                    if rels is None:
+                        rels = NotesReader._read_rels(package, names, slide_name)  # pylint: disable=protected-access
+                    reltype, target_name = rels.get(rId, (None, None))
+                    if reltype == RT_IMAGE and target_name in names:
+                        image_names.append(target_name)
+                element.clear()
+
+        text = "".join(text + " " for text in texts)
+        return text.strip(), image_names
+
+    @staticmethod
+    def _is_plain_picture(pic):
+        # Placeholder pictures and movies are not reported as pictures by python-pptx
+        nv_pr = pic.find("p:nvPicPr/p:nvPr", NS)
+        if nv_pr is None:
+            return True
+        return nv_pr.find("p:ph", NS) is None and nv_pr.find("a:videoFile", NS) is None
+
+
+class _MediaStream:
+    # Keeps the zip open for as long as the member stream is in use
+    def __init__(self, package, stream):
+        self._package = package
+        self._stream = stream
+
+    def __enter__(self):
+        return self._stream
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stream.close()
+        self._package.close()
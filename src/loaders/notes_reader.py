@@ -0,0 +1,225 @@
+import posixpath
+import zipfile
+from lxml import etree
+from instrumentation.instrumentation import instrumented, register
+
+NS = {
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "rel": "http://schemas.openxmlformats.org/package/2006/relationships",
+}
+
+RT_OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+RT_NOTES_SLIDE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/notesSlide"
+
+# Shape elements that can appear as direct children of a shape tree
+SHAPE_TAGS = [f"{{{NS['p']}}}{tag}" for tag in ("sp", "grpSp", "graphicFrame", "cxnSp", "pic", "contentPart")]
+SP_TREE_TAG = f"{{{NS['p']}}}spTree"
+
+# Paragraph children contributing to the text, as in python-pptx's _Paragraph.text
+TEXT_RUN_TAGS = {f"{{{NS['a']}}}r", f"{{{NS['a']}}}fld"}
+LINE_BREAK_TAG = f"{{{NS['a']}}}br"
+
+
+def find_text_between_delimiters(notes_text, start_delimiter="###", end_delimiter="###"):
+    """
+    Find the text segments between each pair of start and end delimiters.
+
+    :param notes_text: Text to search
+    :param start_delimiter: The start delimiter string to search for
+    :param end_delimiter: The end delimiter string that marks the end of the text segment
+    :return: A list of extracted text segments
+    """
+    extracted_texts = []
+
+    # Initialize search position
+    search_pos = 0
+
+    # Search for the first occurrence of the start delimiter
+    start_pos = notes_text.find(start_delimiter, search_pos)
+
+    while start_pos != -1:
+        # Find the end delimiter starting from the character after the start delimiter
+        end_pos = notes_text.find(end_delimiter, start_pos + len(start_delimiter))
+
+        # If the end delimiter is found, extract the text between delimiters
+        if end_pos != -1:
+            # Extract text segment and add to the list
+            extracted_text = notes_text[start_pos + len(start_delimiter):end_pos].strip()
+            extracted_texts.append(extracted_text)
+
+            # Update search position to continue searching after the current end delimiter
+            search_pos = end_pos + len(end_delimiter)
+        else:
+            # If no end delimiter is found, stop searching
+            break
+
+        # Search for the next occurrence of the start delimiter
+        start_pos = notes_text.find(start_delimiter, search_pos)
+
+    return extracted_texts
+
+
+def find_text_after_delimiter(notes_text, delimiter="###"):
+    """
+    Find the text following the first occurrence of a delimiter.
+
+    :param notes_text: Text to search
+    :param delimiter: The delimiter string to search for
+    :return: Text after the delimiter, or an empty string if the delimiter is not found
+    """
+    delimiter_position = notes_text.find(delimiter)
+    if delimiter_position == -1:
+        return ""
+    return notes_text[delimiter_position + len(delimiter):].strip()
+
+
+@register
+class NotesReader:
+    """
+    Read slide notes straight from the .pptx zip, without building a python-pptx Presentation.
+
+    Slide order is resolved from presentation.xml and its relationships, and only the notes
+    slide parts are parsed. The notes text is the same as python-pptx's
+    `slide.notes_slide.notes_text_frame.text`, so results match the PPTXLoader methods.
+    """
+    def __init__(self, pptx_file):
+        """
+        Initialize the NotesReader with a PowerPoint file.
+
+        :param pptx_file: Path to the PowerPoint file, or a binary file-like object
+        """
+        self.pptx_file = pptx_file
+
+    def iter_notes(self):
+        """
+        Generate the notes of each slide, in presentation order.
+
+        :return: Generator of (slide number, slide id, notes text) tuples; the notes text is None
+                 for slides without a notes slide
+        """
+        with zipfile.ZipFile(self.pptx_file) as package:
+            names = set(package.namelist())
+            for number, (slide_id, slide_name) in enumerate(self._iter_slide_parts(package, names), start=1):
+                notes_name = self._related_part_name(package, names, slide_name, RT_NOTES_SLIDE)
+                if notes_name is None:
+                    yield number, slide_id, None
+                else:
+                    with package.open(notes_name) as notes_part:
+                        yield number, slide_id, self._read_notes_text(notes_part)
+
+    @instrumented("notes_reader.extract_notes_after_delimiter")
+    def extract_notes_after_delimiter_for_all_slides(self, delimiter):
+        """
+        Extract text from the presentation notes after a specific delimiter for all slides.
+
+        :param delimiter: The delimiter string to search for in the notes.
+        :return: A dictionary with slide numbers as keys and extracted text as values.
+        """
+        extracted_text = {}
+
+        for number, _, notes_text in self.iter_notes():
+            if notes_text is None:
+                continue
+            text_after_delimiter = find_text_after_delimiter(notes_text, delimiter)
+            if text_after_delimiter:
+                extracted_text[number] = text_after_delimiter
+
+        return extracted_text
+
+    @instrumented("notes_reader.extract_text_between_delimiters")
+    def extract_text_from_notes_between_delimiters_for_all_slides(self, start_delimiter="###", end_delimiter="###"):
+        """
+        Extract the text segments between delimiters from the notes of all slides.
+
+        :param start_delimiter: The start delimiter string to search for in the notes.
+        :param end_delimiter: The end delimiter string that marks the end of the text segment.
+        :return: A dictionary with slide numbers as keys and the list of segments as values,
+                 for the slides that have at least one segment.
+        """
+        extracted_texts = {}
+
+        for number, _, notes_text in self.iter_notes():
+            if notes_text is None:
+                continue
+            segments = find_text_between_delimiters(notes_text, start_delimiter, end_delimiter)
+            if segments:
+                extracted_texts[number] = segments
+
+        return extracted_texts
+
+    @classmethod
+    def _iter_slide_parts(cls, package, names):
+        presentation_name = cls._related_part_name(package, names, "", RT_OFFICE_DOCUMENT)
+        slide_targets = cls._read_rels(package, names, presentation_name)
+
+        with package.open(presentation_name) as presentation_part:
+            for _, sld_id in etree.iterparse(presentation_part, tag=f"{{{NS['p']}}}sldId"):
+                slide_name = slide_targets.get(sld_id.get(f"{{{NS['r']}}}id"), (None, None))[1]
+                # Relationships pointing at missing parts are ignored, like python-pptx does
+                if slide_name in names:
+                    yield int(sld_id.get("id")), slide_name
+                sld_id.clear()
+
+    @classmethod
+    def _related_part_name(cls, package, names, source_name, reltype):
+        for rel_type, target_name in cls._read_rels(package, names, source_name).values():
+            if rel_type == reltype and target_name in names:
+                return target_name
+        return None
+
+    @staticmethod
+    def _read_rels(package, names, source_name):
+        """
+        Return {rId: (reltype, target part name)} for the internal relationships of a part.
+        """
+        directory, filename = posixpath.split(source_name)
+        rels_name = posixpath.join(directory, "_rels", filename + ".rels")
+        if rels_name not in names:
+            return {}
+
+        rels = {}
+        root = etree.fromstring(package.read(rels_name))
+        for rel in root.iterfind("rel:Relationship", NS):
+            if rel.get("TargetMode") == "External":
+                continue
+            target = rel.get("Target")
+            if target.startswith("/"):
+                target_name = target[1:]
+            else:
+                target_name = posixpath.normpath(posixpath.join(directory, target))
+            rels[rel.get("Id")] = (rel.get("Type"), target_name)
+        return rels
+
+    @staticmethod
+    def _read_notes_text(notes_part):
+        # The notes text lives in the first body placeholder of the notes slide's shape tree
+        for _, element in etree.iterparse(notes_part, tag=SHAPE_TAGS):
+            if element.getparent().tag != SP_TREE_TAG:
+                continue
+
+            ph = element.find("./*[1]/p:nvPr/p:ph", NS)
+            if ph is not None and ph.get("type") == "body":
+                return NotesReader._text_frame_text(element.find("p:txBody", NS))
+            element.clear()
+
+        return ""
+
+    @staticmethod
+    def _text_frame_text(tx_body):
+        if tx_body is None:
+            return ""
+
+        paragraphs = []
+        for paragraph in tx_body.iterfind("a:p", NS):
+            text = []
+            for child in paragraph:
+                if child.tag in TEXT_RUN_TAGS:
+                    t = child.find("a:t", NS)
+                    if t is not None and t.text is not None:
+                        text.append(t.text)
+                elif child.tag == LINE_BREAK_TAG:
+                    text.append("\v")
+            paragraphs.append("".join(text))
+        return "\n".join(paragraphs)
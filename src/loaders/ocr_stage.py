@@ -0,0 +1,157 @@
+import hashlib
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from loaders.image_triage import ImageTriage, triage_ocr
+from instrumentation.instrumentation import instrumented, register
+
+
+def ocr_image(image):
+    """
+    Run OCR on an image and return the recognized text.
+
+    :param image: PIL image to interpret
+    :return: Text found in the image
+    """
+    # Imported here so processes that never run OCR do not pay for it
+    import pytesseract
+
+    # Convert the image to a format suitable for text recognition
+    image = image.convert('L')  # Convert to grayscale
+
+    # Use Tesseract to do OCR on the image
+    return pytesseract.image_to_string(image)
+
+
+def ocr_image_bytes(blob):
+    """
+    Run OCR on an encoded image (e.g. the blob of a picture shape).
+
+    :param blob: Encoded image bytes
+    :return: Text found in the image
+    """
+    from PIL import Image
+
+    return ocr_image(Image.open(io.BytesIO(blob)))
+
+
+@register
+class OCRStage:
+    """
+    Run OCR over a batch of images, once per distinct image.
+
+    Images are deduplicated by the SHA1 of their bytes before they are dispatched, looked up in
+    an optional persistent cache (see caching.disk_cache.DiskCache), and the remaining ones are
+    recognized on a process pool. Images are triaged (see ImageTriage) so generated QR codes,
+    tiny and blank images are answered without OCR.
+    """
+    def __init__(self, workers=None, cache=None, ocr_function=ocr_image_bytes, triage=None):
+        """
+        Initialize the OCR stage.
+
+        :param workers: Number of OCR worker processes, None for one per CPU, 0 to run in the calling thread
+        :param cache: Optional DiskCache mapping image hashes to OCR text
+        :param ocr_function: Picklable function taking image bytes and returning the OCR text
+        :param triage: Optional ImageTriage run before OCR, defaults to one with no registered
+                       images; False to OCR every image
+        """
+        self.workers = os.cpu_count() if workers is None else workers
+        self.cache = cache
+        self.ocr_function = ocr_function
+        self.triage = triage if triage is not None else ImageTriage()
+        self._executor = None
+
+    @staticmethod
+    def image_hash(blob):
+        """
+        Return the key identifying an image in the OCR cache.
+
+        :param blob: Encoded image bytes
+        :return: Hex digest of the image bytes
+        """
+        return hashlib.sha1(blob).hexdigest()
+
+    @instrumented("ocr.run", size=lambda result, self, blobs, *args, **kwargs: sum(len(blob) for blob in blobs))
+    def run(self, blobs, memo=None):
+        """
+        Run OCR on a list of images.
+
+        :param blobs: List of encoded image bytes
+        :param memo: Optional dict of image hash -> OCR text shared between calls, e.g. for the
+                     batches of a single deck; it is updated with the new results
+        :return: List with the OCR text of each image, in the same order
+        """
+        hashes = [self.image_hash(blob) for blob in blobs]
+
+        # Keep a single blob for each distinct image
+        unique_blobs = {}
+        for image_hash, blob in zip(hashes, blobs):
+            unique_blobs.setdefault(image_hash, blob)
+
+        texts = {}
+        if memo is not None:
+            for image_hash in unique_blobs:
+                if image_hash in memo:
+                    texts[image_hash] = memo[image_hash]
+
+        if self.cache is not None:
+            for image_hash in unique_blobs:
+                if image_hash in texts:
+                    continue
+                cached = self.cache.get(self._cache_key(image_hash))
+                if cached is not None:
+                    texts[image_hash] = cached.decode("utf-8")
+
+        # Only the header checks run here, they are not worth caching; the checks decoding the
+        # images run with OCR in the workers, and are cached with it
+        ocr_function = self.ocr_function
+        if self.triage:
+            for image_hash, blob in unique_blobs.items():
+                if image_hash not in texts:
+                    text = self.triage.classify(blob, image_hash)
+                    if text is not None:
+                        texts[image_hash] = text
+            ocr_function = partial(triage_ocr, self.ocr_function)
+
+        pending = [image_hash for image_hash in unique_blobs if image_hash not in texts]
+        if pending:
+            pending_blobs = [unique_blobs[image_hash] for image_hash in pending]
+            if self.workers and len(pending) > 1:
+                recognized = self._get_executor().map(ocr_function, pending_blobs)
+            else:
+                recognized = map(ocr_function, pending_blobs)
+
+            for image_hash, text in zip(pending, recognized):
+                texts[image_hash] = text
+                if self.cache is not None:
+                    self.cache.set(self._cache_key(image_hash), text.encode("utf-8"))
+
+        if memo is not None:
+            memo.update(texts)
+
+        return [texts[image_hash] for image_hash in hashes]
+
+    def close(self):
+        """
+        Shut down the worker processes, if any were started.
+        """
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _get_executor(self):
+        # The pool is started on first use and reused for every following batch
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    @staticmethod
+    def _cache_key(image_hash):
+        return f"ocr:{image_hash}"
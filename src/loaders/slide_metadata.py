@@ -0,0 +1,142 @@
+import json
+from collections import defaultdict
+from loaders.notes_reader import NotesReader, find_text_between_delimiters
+
+# Payload values of these types are also indexed by value, e.g. slides_with("op", "PBM")
+INDEXED_VALUE_TYPES = (str, int, float, bool, type(None))
+
+
+def parse_metadata_payloads(notes_text, start_delimiter="###", end_delimiter="###"):
+    """
+    Parse the JSON payloads stored between delimiters in a slide's notes.
+
+    :param notes_text: Text of the slide notes
+    :param start_delimiter: The start delimiter string of each payload
+    :param end_delimiter: The end delimiter string of each payload
+    :return: A list of the parsed payloads, segments that are not valid JSON are skipped
+    """
+    payloads = []
+    for segment in find_text_between_delimiters(notes_text, start_delimiter, end_delimiter):
+        try:
+            payloads.append(json.loads(segment))
+        except ValueError:
+            continue
+    return payloads
+
+
+class SlideMetadataIndex:
+    """
+    Deck-wide index of the JSON metadata stored in slide notes.
+
+    Built in a single pass over the deck, it maps slide ids to their parsed payloads, payload
+    keys to the slides carrying them, and (key, value) pairs of scalar values to slides, so
+    lookups after loading do not rescan any notes.
+    """
+    def __init__(self):
+        self.payloads = {}
+        self.slide_numbers = {}
+        self._slides_by_key = defaultdict(list)
+        self._slides_by_value = defaultdict(list)
+
+    @classmethod
+    def from_pptx(cls, pptx_file, start_delimiter="###", end_delimiter="###"):
+        """
+        Build the index straight from a .pptx file, without parsing the whole presentation.
+
+        :param pptx_file: Path to the PowerPoint file, or a binary file-like object
+        :param start_delimiter: The start delimiter string of each payload
+        :param end_delimiter: The end delimiter string of each payload
+        :return: The SlideMetadataIndex
+        """
+        index = cls()
+        for slide_number, slide_id, notes_text in NotesReader(pptx_file).iter_notes():
+            if notes_text is not None:
+                index.add_slide(slide_number, slide_id, notes_text, start_delimiter, end_delimiter)
+        return index
+
+    @classmethod
+    def from_presentation(cls, presentation, start_delimiter="###", end_delimiter="###"):
+        """
+        Build the index from a python-pptx Presentation.
+
+        :param presentation: The presentation to index
+        :param start_delimiter: The start delimiter string of each payload
+        :param end_delimiter: The end delimiter string of each payload
+        :return: The SlideMetadataIndex
+        """
+        index = cls()
+        for i, slide in enumerate(presentation.slides):
+            if slide.has_notes_slide:
+                notes_text = slide.notes_slide.notes_text_frame.text
+                index.add_slide(i + 1, slide.slide_id, notes_text, start_delimiter, end_delimiter)
+        return index
+
+    def add_slide(self, slide_number, slide_id, notes_text, start_delimiter="###", end_delimiter="###"):
+        """
+        Index the metadata payloads found in the notes of one slide.
+
+        :param slide_number: 1-based position of the slide in the deck
+        :param slide_id: The slide id (slide.slide_id)
+        :param notes_text: Text of the slide notes
+        :param start_delimiter: The start delimiter string of each payload
+        :param end_delimiter: The end delimiter string of each payload
+        """
+        payloads = parse_metadata_payloads(notes_text, start_delimiter, end_delimiter)
+        if not payloads:
+            return
+
+        self.payloads[slide_id] = payloads
+        self.slide_numbers[slide_id] = slide_number
+
+        for payload in payloads:
+            if not isinstance(payload, dict):
+                continue
+            for key, value in payload.items():
+                self._add_unique(self._slides_by_key[key], slide_id)
+                if isinstance(value, INDEXED_VALUE_TYPES):
+                    self._add_unique(self._slides_by_value[(key, value)], slide_id)
+
+    def get(self, slide_id, key, default=None):
+        """
+        Return the value stored under a key for a slide.
+
+        :param slide_id: The slide id
+        :param key: Metadata key
+        :param default: Value returned if the slide has no such key
+        :return: The value of the last payload of the slide carrying the key
+        """
+        for payload in reversed(self.payloads.get(slide_id, [])):
+            if isinstance(payload, dict) and key in payload:
+                return payload[key]
+        return default
+
+    def slides_with_key(self, key):
+        """
+        Return the ids of the slides carrying a metadata key, in deck order.
+
+        :param key: Metadata key
+        :return: List of slide ids
+        """
+        return list(self._slides_by_key.get(key, []))
+
+    def slides_with(self, key, value):
+        """
+        Return the ids of the slides whose metadata maps a key to a scalar value, in deck order.
+
+        :param key: Metadata key
+        :param value: Scalar value (str, number, bool or None)
+        :return: List of slide ids
+        """
+        return list(self._slides_by_value.get((key, value), []))
+
+    def __contains__(self, slide_id):
+        return slide_id in self.payloads
+
+    def __len__(self):
+        return len(self.payloads)
+
+    @staticmethod
+    def _add_unique(slide_ids, slide_id):
+        # Slides are added in deck order, so a duplicate can only be the last entry
+        if not slide_ids or slide_ids[-1] != slide_id:
+            slide_ids.append(slide_id)
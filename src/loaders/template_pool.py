@@ -0,0 +1,128 @@
+import copy
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from pptx import Presentation
+from pptx.opc.package import XmlPart
+from instrumentation.instrumentation import instrumented, register
+
+
+@register
+class TemplatePool:
+    """
+    Keep parsed PowerPoint templates in memory and hand out independent clones of them.
+
+    Each template is parsed once and stored under its path plus modification time and size
+    (and optionally a content hash). Clones deep-copy the XML parts but share the immutable
+    binary parts (images, media, fonts) with the pooled template, so they are cheaper to
+    create than a fresh parse and do not duplicate the template's media in memory.
+    """
+    def __init__(self, max_templates=8, max_bytes=512 * 1024 * 1024, verify_hash=False):
+        """
+        Initialize the template pool.
+
+        :param max_templates: Maximum number of parsed templates kept in the pool
+        :param max_bytes: Maximum total size of the pooled templates, measured by their file size
+        :param verify_hash: Also key templates by a SHA256 of their content, for file systems
+                            where the modification time is not reliable
+        """
+        self.max_templates = max_templates
+        self.max_bytes = max_bytes
+        self.verify_hash = verify_hash
+
+        # path -> (key, presentation, size), least recently used first
+        self._templates = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @instrumented("template_pool.get")
+    def get(self, pptx_file):
+        """
+        Return an independent copy of the presentation stored in a template file.
+
+        :param pptx_file: Path to the PowerPoint file, or a file-like object (which is parsed directly)
+        :return: A python-pptx Presentation that can be modified freely
+        """
+        if not isinstance(pptx_file, (str, os.PathLike)):
+            return Presentation(pptx_file)
+
+        path = os.path.realpath(pptx_file)
+        key = self._template_key(path)
+
+        with self._lock:
+            entry = self._templates.get(path)
+            if entry is not None and entry[0] == key:
+                self._templates.move_to_end(path)
+                return self._clone(entry[1])
+
+        # Parse outside of the lock so different templates can load concurrently
+        presentation = Presentation(path)
+        size = key[2]
+
+        with self._lock:
+            self._discard(path)
+            if size <= self.max_bytes:
+                self._templates[path] = (key, presentation, size)
+                self._total_bytes += size
+                self._evict()
+
+        return self._clone(presentation)
+
+    def invalidate(self, pptx_file=None):
+        """
+        Drop a template from the pool, or every template if no file is given.
+
+        :param pptx_file: Path to the PowerPoint file to drop
+        """
+        with self._lock:
+            if pptx_file is None:
+                self._templates.clear()
+                self._total_bytes = 0
+            else:
+                self._discard(os.path.realpath(pptx_file))
+
+    def __contains__(self, pptx_file):
+        return os.path.realpath(pptx_file) in self._templates
+
+    def __len__(self):
+        return len(self._templates)
+
+    @property
+    def total_bytes(self):
+        """
+        Total size of the pooled templates, measured by their file size.
+        """
+        return self._total_bytes
+
+    def _template_key(self, path):
+        stat = os.stat(path)
+        digest = None
+        if self.verify_hash:
+            sha256 = hashlib.sha256()
+            with open(path, "rb") as template_file:
+                for chunk in iter(lambda: template_file.read(1024 * 1024), b""):
+                    sha256.update(chunk)
+            digest = sha256.hexdigest()
+        return (stat.st_mtime_ns, digest, stat.st_size)
+
+    def _discard(self, path):
+        entry = self._templates.pop(path, None)
+        if entry is not None:
+            self._total_bytes -= entry[2]
+
+    def _evict(self):
+        while self._templates and (len(self._templates) > self.max_templates or
+                                   self._total_bytes > self.max_bytes):
+            _, (_, _, size) = self._templates.popitem(last=False)
+            self._total_bytes -= size
+
+    @staticmethod
+    @instrumented("template_pool.clone")
+    def _clone(presentation):
+        # Binary parts are never modified in place, so the clone can point at the pooled ones
+        memo = {}
+        for part in presentation.part.package.iter_parts():
+            if not isinstance(part, XmlPart):
+                memo[id(part)] = part
+        return copy.deepcopy(presentation, memo)
@@ -0,0 +1,97 @@
+import asyncio
+import json
+from io import BytesIO
+from content_generators.qr_generator import QRGenerator
+from slides_builder.slides_builder import SlidesBuilder
+
+
+class AsyncSlidesBuilder:
+    """
+    asyncio front-end for SlidesBuilder.
+
+    Every blocking call runs on a StageExecutor under one of the stages "load", "qr", "build"
+    and "save". Calls on the same builder are serialized by a per-builder lock, while calls on
+    different builders run concurrently up to the limits of their stages. QR codes are encoded
+    outside of the lock, so slow encodes do not hold up other calls on the builder.
+    """
+    def __init__(self, builder, stages):
+        """
+        Wrap an existing SlidesBuilder, see open() to load one without blocking.
+
+        :param builder: The SlidesBuilder to drive
+        :param stages: The StageExecutor running the blocking calls
+        """
+        self.builder = builder
+        self.stages = stages
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def open(cls, pptx_file, stages, template_pool=None):
+        """
+        Load a PowerPoint file on the executor.
+
+        :param pptx_file: Path to the PowerPoint file, or a file-like object
+        :param stages: The StageExecutor running the blocking calls
+        :param template_pool: Optional TemplatePool to take a parsed copy of the file from
+        :return: An AsyncSlidesBuilder
+        """
+        builder = await stages.run("load", SlidesBuilder, pptx_file, template_pool)
+        return cls(builder, stages)
+
+    async def call(self, stage, method, *args, **kwargs):
+        """
+        Call any SlidesBuilder method on the executor, under the builder's lock.
+
+        :param stage: Name of the stage the call is counted against
+        :param method: Name of the SlidesBuilder method
+        :return: The result of the method
+        """
+        return await self.stages.run(stage, getattr(self.builder, method), *args, lock=self._lock, **kwargs)
+
+    async def add_qr_slide(self, qr_data, text_dict, slide_title, slide_content="", slide_index=None, vector=False):
+        """
+        Add a slide with QR codes, see SlidesBuilder.add_qr_slide.
+
+        :return: List of the new slides
+        """
+        # Warm the QR cache first, the slide is then built from the cached code
+        payload = json.dumps(qr_data)
+        if vector:
+            await self.stages.run("qr", QRGenerator.generate_qr_matrix, payload)
+        else:
+            await self.stages.run("qr", QRGenerator.generate_qr_png, payload)
+
+        return await self.call("build", "add_qr_slide", qr_data, text_dict, slide_title, slide_content,
+                               slide_index, vector=vector)
+
+    async def add_slide_with_title_and_content(self, title, content, slide_index=None):
+        return await self.call("build", "add_slide_with_title_and_content", title, content, slide_index)
+
+    async def add_full_slide_image(self, image_path, layout_idx=6, slide_index=None):
+        return await self.call("build", "add_full_slide_image", image_path, layout_idx, slide_index)
+
+    async def append_notes_to_slide(self, slide, notes, delimiter="###"):
+        return await self.call("build", "append_notes_to_slide", slide, notes, delimiter)
+
+    async def set_slide_metadata(self, slide, key, value, delimiter="###"):
+        return await self.call("build", "set_slide_metadata", slide, key, value, delimiter)
+
+    async def save(self, output_file, incremental=False):
+        """
+        Save the presentation without blocking the event loop.
+
+        :param output_file: Path or file-like object to write to
+        :param incremental: Copy the unchanged parts from the source file, see SlidesBuilder.save
+        """
+        await self.call("save", "save", output_file, incremental=incremental)
+
+    async def to_bytes(self, incremental=False):
+        """
+        Serialize the presentation without blocking the event loop.
+
+        :param incremental: Copy the unchanged parts from the source file, see SlidesBuilder.save
+        :return: The .pptx file content
+        """
+        output = BytesIO()
+        await self.save(output, incremental=incremental)
+        return output.getvalue()
@@ -0,0 +1,187 @@
+"""
+Build many decks in parallel from declarative job specs.
+
+A deck spec is a JSON-compatible dict:
+
+    {
+        "template": "../tests/inputs/test2.pptx",
+        "output": "../tests/outputs/poll.pptx",   # omit to get the deck bytes back instead
+        "slides": [
+            {"type": "qr", "title": "What is more dangerous?", "data": "engageli-op://{'op': 'PBM'}",
+             "options": {"0": "Diet coke", "1": "Ice cream"}, "metadata": {"poll": 1}},
+            {"type": "title_content", "title": "Agenda", "content": "..."},
+            {"type": "image", "image": "../tests/inputs/logo.png", "notes": "..."}
+        ]
+    }
+
+Every slide may carry "notes" (appended as a delimited paragraph) and "metadata" (stored with
+SlidesBuilder.set_slide_metadata). generate_decks fans a batch of specs out over a process pool
+whose workers each keep a TemplatePool, and yields one result per deck as soon as it is done:
+
+    for result in generate_decks(specs, workers=8):
+        if result["error"]:
+            print(result["index"], result["error"])
+
+It can also be run from the src directory on a file with one spec per line:
+
+    python -m slides_builder.bulk jobs.ndjson --workers 8 > results.ndjson
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from io import BytesIO
+from loaders.template_pool import TemplatePool
+from slides_builder.slides_builder import SlidesBuilder
+
+# Number of jobs queued per worker, so results stream back without submitting the whole batch
+JOBS_PER_WORKER = 4
+
+# TemplatePool of the current worker process, created by _init_worker
+_worker_template_pool = None
+
+
+def build_deck(spec, template_pool=None):
+    """
+    Build one deck from a spec.
+
+    :param spec: Deck spec, see the module docstring
+    :param template_pool: Optional TemplatePool to take a parsed copy of the template from
+    :return: A dict with the "output" path (or the deck "bytes" if the spec has no output) and
+             the number of "slides" added
+    """
+    builder = SlidesBuilder(spec["template"], template_pool)
+
+    # Slides are added in one batch so the slide order is only rewritten once
+    with builder.batch():
+        for slide_spec in spec.get("slides", []):
+            # A QR poll with many options spans several slides, each gets the notes and metadata
+            for slide in _add_slides(builder, slide_spec):
+                if slide_spec.get("notes"):
+                    builder.append_notes_to_slide(slide, slide_spec["notes"])
+                for key, value in slide_spec.get("metadata", {}).items():
+                    builder.set_slide_metadata(slide, key, value)
+
+    result = {"output": spec.get("output"), "slides": len(spec.get("slides", []))}
+    if spec.get("output"):
+        builder.save(spec["output"])
+    else:
+        deck_bytes = BytesIO()
+        builder.save(deck_bytes)
+        result["bytes"] = deck_bytes.getvalue()
+    return result
+
+
+def _add_slides(builder, slide_spec):
+    slide_type = slide_spec.get("type")
+
+    if slide_type == "qr":
+        # JSON object keys are strings, add_qr_slide expects the option indexes as ints
+        options = {int(index): text for index, text in slide_spec.get("options", {}).items()}
+        return builder.add_qr_slide(slide_spec["data"], options, slide_spec.get("title", ""),
+                                    slide_spec.get("content", ""), vector=slide_spec.get("vector", False))
+    if slide_type == "title_content":
+        return [builder.add_slide_with_title_and_content(slide_spec.get("title", ""), slide_spec.get("content", ""))]
+    if slide_type == "image":
+        return [builder.add_full_slide_image(slide_spec["image"], slide_spec.get("layout", 6))]
+
+    raise ValueError(f"Unknown slide type: {slide_type!r}")
+
+
+def run_job(index, spec, template_pool=None):
+    """
+    Build one deck and report the outcome instead of raising.
+
+    :param index: Position of the spec in the batch
+    :param spec: Deck spec
+    :param template_pool: TemplatePool to use, defaults to the worker's pool
+    :return: A result dict with "index", "output", "slides", "seconds" and "error" (None on success)
+    """
+    start = time.perf_counter()
+    result = {"index": index, "output": spec.get("output"), "slides": 0, "error": None}
+    try:
+        result.update(build_deck(spec, template_pool if template_pool is not None else _worker_template_pool))
+    except Exception as error:  # pylint: disable=broad-except
+        result["error"] = f"{type(error).__name__}: {error}"
+        result["traceback"] = traceback.format_exc()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _init_worker(max_templates, templates):
+    global _worker_template_pool
+    _worker_template_pool = TemplatePool(max_templates=max_templates)
+
+    # Parse the templates up front, so the first job of each worker does not pay for it
+    for template in templates:
+        try:
+            _worker_template_pool.get(template)
+        except Exception:  # pylint: disable=broad-except
+            # A broken template is reported by the jobs using it
+            pass
+
+
+def generate_decks(specs, workers=None, max_templates=8, warm_templates=None):
+    """
+    Build a batch of decks on a process pool and yield the results as the decks are done.
+
+    Results come back in completion order; use their "index" to match them to the specs. A
+    failing deck does not stop the batch, its result carries the error instead.
+
+    :param specs: Iterable of deck specs, consumed lazily
+    :param workers: Number of worker processes, None for one per CPU, 0 to build in this process
+    :param max_templates: Number of parsed templates each worker keeps
+    :param warm_templates: Templates every worker parses on start, defaults to none
+    :return: Generator of result dicts, see run_job
+    """
+    workers = os.cpu_count() if workers is None else workers
+    warm_templates = list(warm_templates or [])
+
+    if not workers:
+        template_pool = TemplatePool(max_templates=max_templates)
+        for index, spec in enumerate(specs):
+            yield run_job(index, spec, template_pool)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(max_templates, warm_templates)) as executor:
+        pending = set()
+        for index, spec in enumerate(specs):
+            pending.add(executor.submit(run_job, index, spec))
+
+            # Keep a bounded number of jobs in flight and hand out what is already done
+            if len(pending) >= workers * JOBS_PER_WORKER:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("jobs", help="file with one deck spec per line, - for stdin")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, 0 to build in this process")
+    parser.add_argument("--warm", nargs="*", default=[], help="templates every worker parses on start")
+    args = parser.parse_args(argv)
+
+    jobs_file = sys.stdin if args.jobs == "-" else open(args.jobs)
+    failed = 0
+    with jobs_file:
+        specs = (json.loads(line) for line in jobs_file if line.strip())
+        for result in generate_decks(specs, args.workers, warm_templates=args.warm):
+            result.pop("bytes", None)
+            result.pop("traceback", None)
+            failed += result["error"] is not None
+            print(json.dumps(result), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
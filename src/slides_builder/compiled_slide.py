@@ -0,0 +1,163 @@
+import copy
+import re
+from contextlib import nullcontext
+from pptx.opc.constants import CONTENT_TYPE as CT
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.oxml.ns import qn
+from pptx.parts.slide import SlidePart
+from instrumentation.instrumentation import instrumented, register
+
+# Text field markers of a prototype slide, e.g. {title}
+FIELD_PATTERN = re.compile(r"\{(\w+)\}")
+
+# Relationships of the prototype slide that are not shared with the stamped slides
+PER_SLIDE_RELTYPES = (RT.NOTES_SLIDE, RT.COMMENTS)
+
+# Attributes in this namespace hold relationship ids (r:embed, r:id, r:link, ...)
+R_ATTRIBUTE_PREFIX = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
+
+@register
+class CompiledSlide:
+    """
+    A slide recorded as a parameterized XML template, to create many slides of the same structure.
+
+    The prototype slide is built once through the regular builder methods, with {name} markers
+    in the texts that change from slide to slide and, optionally, pictures whose image changes.
+    Stamping a new slide copies the recorded XML, replaces the markers, relates the new part to
+    the prototype's layout and media directly and adds it to the deck through a SlideBatch, so
+    no shapes are created through python-pptx's object layer.
+
+        pages = builder.compile_qr_slide(option_count=4, sample_data=longest_data)
+        with builder.batch():
+            for question in questions:
+                for page in pages:
+                    page.stamp({"title": question["title"], "content": "", "option0": ..., ...},
+                               images={"qr": QRGenerator.generate_qr_png(json.dumps(question["data"]))})
+
+    Markers must each be inside a single text run, which is the case for text set with
+    python-pptx's .text setters.
+    """
+    def __init__(self, builder, slide, image_fields=None):
+        """
+        Record a prototype slide.
+
+        :param builder: The SlidesBuilder the slides are stamped into
+        :param slide: The prototype slide; it can be deleted once compiled
+        :param image_fields: Optional dict of field name -> picture shape (or list of picture
+                             shapes) of the prototype whose image is given when stamping
+        """
+        self.builder = builder
+
+        source = slide.part._element  # pylint: disable=protected-access
+        element = copy.deepcopy(source)
+
+        # Image fields are located by the position of their a:blip in document order
+        source_blips = list(source.iter(qn("a:blip")))
+        field_rIds = set()
+        self._image_fields = []
+        for name, shapes in (image_fields or {}).items():
+            if not isinstance(shapes, (list, tuple)):
+                shapes = [shapes]
+            for shape in shapes:
+                blip = shape._element.find(".//" + qn("a:blip"))  # pylint: disable=protected-access
+                self._image_fields.append((name, source_blips.index(blip)))
+                field_rIds.add(blip.get(qn("r:embed")))
+
+        # rIds still referenced once the image fields are set aside
+        blips = list(element.iter(qn("a:blip")))
+        field_blips = {id(blips[index]) for _, index in self._image_fields}
+        referenced = set()
+        for node in element.iter():
+            if id(node) in field_blips:
+                continue
+            for attribute, value in node.attrib.items():
+                if attribute.startswith(R_ATTRIBUTE_PREFIX):
+                    referenced.add(value)
+
+        # Relationships copied to every stamped slide, renumbered from rId1
+        self._rels = []
+        rId_map = {}
+        for rId in sorted(slide.part.rels, key=lambda rId: int(rId[3:]) if rId[3:].isdigit() else 0):
+            rel = slide.part.rels[rId]
+            if rel.reltype in PER_SLIDE_RELTYPES or (rId in field_rIds and rId not in referenced):
+                continue
+            target = rel.target_ref if rel.is_external else rel.target_part
+            self._rels.append((rel.reltype, target, rel.is_external))
+            rId_map[rId] = "rId%d" % len(self._rels)
+
+        for node in element.iter():
+            for attribute, value in node.attrib.items():
+                if attribute.startswith(R_ATTRIBUTE_PREFIX) and value in rId_map:
+                    node.set(attribute, rId_map[value])
+
+        # Text runs with field markers, by position in document order
+        self._text_fields = []
+        self.fields = set()
+        for index, text in enumerate(element.iter(qn("a:t"))):
+            names = FIELD_PATTERN.findall(text.text or "")
+            if names:
+                self._text_fields.append((index, text.text))
+                self.fields.update(names)
+        self.image_field_names = {name for name, _ in self._image_fields}
+
+        self._element = element
+
+    @instrumented("compiled_slide.stamp")
+    def stamp(self, values, images=None, slide_index=None):
+        """
+        Add a slide from the template.
+
+        Outside of a batch the slide is added in a batch of its own; stamp many slides inside
+        builder.batch() to add them all in one pass. Images are added through the builder's image
+        index (see SlidesBuilder.shared_image_part), so a distinct image per slide costs no
+        package scan either.
+
+        :param values: Dict of text field name -> value; every field of the template is required
+        :param images: Dict of image field name -> encoded image bytes
+        :param slide_index: Index of the new slide, None to append it
+        :return: The new slide
+        """
+        batch = self.builder._batch  # pylint: disable=protected-access
+        if batch is None:
+            with self.builder.batch():
+                return self.stamp(values, images, slide_index)
+
+        element = copy.deepcopy(self._element)
+
+        if self._text_fields:
+            texts = list(element.iter(qn("a:t")))
+            for index, template in self._text_fields:
+                texts[index].text = FIELD_PATTERN.sub(lambda match: str(values[match.group(1)]), template)
+
+        slide_part = SlidePart(batch.next_partname(), CT.PML_SLIDE, self.builder.presentation.part.package, element)
+        rels = slide_part.rels
+        for reltype, target, is_external in self._rels:
+            rels._add_relationship(reltype, target, is_external)  # pylint: disable=protected-access
+
+        if self._image_fields:
+            blips = list(element.iter(qn("a:blip")))
+            rIds = {}
+            for name, index in self._image_fields:
+                if name not in rIds:
+                    image_part = self.builder.shared_image_part(images[name])
+                    rIds[name] = rels._add_relationship(RT.IMAGE, image_part)  # pylint: disable=protected-access
+                blips[index].set(qn("r:embed"), rIds[name])
+
+        return batch.insert_part(slide_part, slide_index)
+
+    def stamp_many(self, rows, slide_index=None):
+        """
+        Add a slide for each row, in one batch.
+
+        :param rows: Iterable of (values, images) pairs, see stamp
+        :param slide_index: Index of the first new slide, None to append them
+        :return: List of the new slides
+        """
+        slides = []
+        with self.builder.batch() if self.builder._batch is None else nullcontext():  # pylint: disable=protected-access
+            for values, images in rows:
+                index = None if slide_index is None else slide_index + len(slides)
+                slides.append(self.stamp(values, images, index))
+        return slides
+
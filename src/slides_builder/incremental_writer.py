@@ -0,0 +1,120 @@
+import os
+import struct
+import zipfile
+from pptx.opc.serialized import PackageWriter
+
+# Flag bits of a zip member: encrypted, and sizes/CRC stored in a trailing data descriptor
+_FLAG_ENCRYPTED = 0x01
+_FLAG_DATA_DESCRIPTOR = 0x08
+
+# Chunk size used when copying member data between archives
+_COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def copy_zip_member(source, name, target, new_name=None):
+    """
+    Copy a member from one zip archive to another without decompressing and recompressing it.
+
+    Relies on zipfile internals (the archives' file objects, locks and member tables), the
+    same way ZipFile.writestr appends a member.
+
+    :param source: ZipFile open for reading
+    :param name: Name of the member in the source archive
+    :param target: ZipFile open for writing to a seekable file
+    :param new_name: Name of the member in the target archive, the same name if None
+    :return: True if the member was copied, False if it cannot be copied raw (e.g. it is encrypted)
+    """
+    info = source.getinfo(name)
+    if info.flag_bits & _FLAG_ENCRYPTED or not target._seekable:  # pylint: disable=protected-access
+        return False
+
+    copied = zipfile.ZipInfo(new_name or name, info.date_time)
+    copied.compress_type = info.compress_type
+    copied.create_system = info.create_system
+    copied.external_attr = info.external_attr
+    copied.CRC = info.CRC
+    copied.compress_size = info.compress_size
+    copied.file_size = info.file_size
+    # Sizes and CRC are known up front, so they go in the local header and no data descriptor follows
+    copied.flag_bits = info.flag_bits & ~_FLAG_DATA_DESCRIPTOR
+    zip64 = info.file_size > zipfile.ZIP64_LIMIT or info.compress_size > zipfile.ZIP64_LIMIT
+
+    with source._lock, target._lock:  # pylint: disable=protected-access
+        # Skip the source's local header, its name and extra field lengths are only known from there
+        source.fp.seek(info.header_offset)
+        header = struct.unpack(zipfile.structFileHeader, source.fp.read(zipfile.sizeFileHeader))
+        if header[zipfile._FH_SIGNATURE] != zipfile.stringFileHeader:  # pylint: disable=protected-access
+            raise zipfile.BadZipFile(f"Bad local header of member {name!r}")
+        source.fp.seek(header[zipfile._FH_FILENAME_LENGTH] + header[zipfile._FH_EXTRA_FIELD_LENGTH],  # pylint: disable=protected-access
+                       os.SEEK_CUR)
+
+        target.fp.seek(target.start_dir)
+        copied.header_offset = target.fp.tell()
+        target._writecheck(copied)  # pylint: disable=protected-access
+        target._didModify = True  # pylint: disable=protected-access
+        target.fp.write(copied.FileHeader(zip64))
+
+        remaining = info.compress_size
+        while remaining:
+            chunk = source.fp.read(min(remaining, _COPY_CHUNK_SIZE))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Truncated data of member {name!r}")
+            target.fp.write(chunk)
+            remaining -= len(chunk)
+
+        target.start_dir = target.fp.tell()
+        target.filelist.append(copied)
+        target.NameToInfo[copied.filename] = copied
+
+    return True
+
+
+class IncrementalPackageWriter(PackageWriter):
+    """
+    Write a package, copying the unchanged parts verbatim from the file it was loaded from.
+
+    A part is copied from the source archive when it was loaded from it and is not marked as
+    modified; it may have been renamed since (e.g. slides renumbered after a delete). Every
+    other part is serialized and compressed as usual, and the [Content_Types].xml and .rels
+    items are always regenerated.
+    """
+    def __init__(self, pkg_file, pkg_rels, parts, source_file, original_partnames, dirty_parts):
+        """
+        :param pkg_file: Path or seekable file-like object to write to
+        :param pkg_rels: The package relationships
+        :param parts: The parts of the package
+        :param source_file: Path of the .pptx file the package was loaded from
+        :param original_partnames: Mapping of part -> partname it had in the source file
+        :param dirty_parts: Collection of parts that were modified since they were loaded
+        """
+        super().__init__(pkg_file, pkg_rels, parts)
+        self._source_file = source_file
+        self._original_partnames = original_partnames
+        self._dirty_parts = dirty_parts
+        self.copied_parts = 0
+
+    @classmethod
+    def write(cls, pkg_file, pkg_rels, parts, source_file=None, original_partnames=None, dirty_parts=()):
+        """
+        Write a physical package (.pptx file) to `pkg_file`.
+
+        :return: Number of parts copied verbatim from the source file
+        """
+        writer = cls(pkg_file, pkg_rels, parts, source_file, original_partnames or {}, dirty_parts)
+        writer._write()
+        return writer.copied_parts
+
+    def _write_parts(self, phys_writer):
+        target = phys_writer._zipf  # pylint: disable=protected-access
+
+        with zipfile.ZipFile(self._source_file) as source:
+            for part in self._parts:
+                original_partname = self._original_partnames.get(part)
+                if (original_partname is not None and part not in self._dirty_parts and
+                        copy_zip_member(source, original_partname.membername, target, part.partname.membername)):
+                    self.copied_parts += 1
+                else:
+                    phys_writer.write(part.partname, part.blob)
+
+                if part._rels:  # pylint: disable=protected-access
+                    phys_writer.write(part.partname.rels_uri, part.rels.xml)
@@ -0,0 +1,166 @@
+from pptx.enum.shapes import PP_PLACEHOLDER
+from instrumentation.instrumentation import instrumented, register
+
+# Placeholder types holding the title of a slide, in order of preference
+TITLE_TYPES = (PP_PLACEHOLDER.TITLE, PP_PLACEHOLDER.CENTER_TITLE, PP_PLACEHOLDER.VERTICAL_TITLE)
+
+# Placeholder types holding the main content of a slide, in order of preference
+BODY_TYPES = (PP_PLACEHOLDER.BODY, PP_PLACEHOLDER.OBJECT, PP_PLACEHOLDER.VERTICAL_BODY,
+              PP_PLACEHOLDER.VERTICAL_OBJECT, PP_PLACEHOLDER.SUBTITLE)
+
+# Placeholder types most layouts carry that do not take slide content
+DECORATION_TYPES = (PP_PLACEHOLDER.DATE, PP_PLACEHOLDER.FOOTER, PP_PLACEHOLDER.SLIDE_NUMBER)
+
+# Layout types (the type attribute of a slide layout) filling each role, in order of preference
+ROLE_LAYOUT_TYPES = {
+    "title_slide": ("title",),
+    "title_and_content": ("obj", "tx"),
+    "section_header": ("secHead",),
+    "title_only": ("titleOnly",),
+    "blank": ("blank",),
+}
+
+
+@register
+class LayoutIndex:
+    """
+    Index the slide layouts of a presentation by position, name and role, and the placeholders
+    of each layout by type and idx.
+
+    The index is built once, so finding the layout for a kind of slide and the placeholders to
+    put its title and content in does not scan the layouts again for every new slide. Slides
+    created from a layout get copies of its placeholders with the same idx, so the idx found
+    here also identifies the placeholder on the slide.
+    """
+    @instrumented("layout_index.build")
+    def __init__(self, presentation):
+        """
+        Build the index.
+
+        :param presentation: The python-pptx Presentation whose layouts are indexed
+        """
+        self.presentation = presentation
+
+        self._names = {}
+        self._partnames = {}
+        self._layout_types = []
+        # Per layout, (idx, type) of each placeholder in document order
+        self._placeholders = []
+        # Per layout, {type: [idx, ...]}
+        self._idx_by_type = []
+
+        for i, layout in enumerate(presentation.slide_layouts):
+            self._names.setdefault(layout.name, i)
+            self._partnames[layout.part.partname] = i
+            self._layout_types.append(layout.element.get("type"))
+
+            placeholders = []
+            idx_by_type = {}
+            for placeholder in layout.placeholders:
+                placeholder_format = placeholder.placeholder_format
+                placeholders.append((placeholder_format.idx, placeholder_format.type))
+                idx_by_type.setdefault(placeholder_format.type, []).append(placeholder_format.idx)
+            self._placeholders.append(placeholders)
+            self._idx_by_type.append(idx_by_type)
+
+        self._roles = {role: self._find_role(role) for role in ROLE_LAYOUT_TYPES}
+
+    def __len__(self):
+        return len(self._placeholders)
+
+    def index_of(self, layout):
+        """
+        Return the position of a layout.
+
+        :param layout: Position, name or SlideLayout object of the layout
+        :return: Position of the layout in presentation.slide_layouts
+        """
+        if isinstance(layout, int):
+            if not -len(self) <= layout < len(self):
+                raise IndexError(f"Slide layout index {layout} out of range")
+            return layout % len(self)
+        if isinstance(layout, str):
+            if layout not in self._names:
+                raise KeyError(f"No slide layout named {layout!r}")
+            return self._names[layout]
+        return self._partnames[layout.part.partname]
+
+    def layout(self, layout):
+        """
+        Return a layout by position or name.
+
+        :param layout: Position, name or SlideLayout object of the layout
+        :return: The SlideLayout
+        """
+        return self.presentation.slide_layouts[self.index_of(layout)]
+
+    def layout_for_role(self, role, default=None):
+        """
+        Return the layout filling a role.
+
+        Layouts are matched by their layout type first and, for templates that do not set it,
+        by the placeholders they have.
+
+        :param role: One of "title_slide", "title_and_content", "section_header", "title_only", "blank"
+        :param default: Value returned if no layout fills the role
+        :return: The SlideLayout, or default
+        """
+        index = self._roles.get(role)
+        if index is None:
+            return default
+        return self.presentation.slide_layouts[index]
+
+    def placeholder_idx(self, layout, types):
+        """
+        Return the idx of the first placeholder of a layout matching one of the given types.
+
+        :param layout: Position, name or SlideLayout object of the layout
+        :param types: PP_PLACEHOLDER types, in order of preference
+        :return: The placeholder idx, or None if the layout has no such placeholder
+        """
+        idx_by_type = self._idx_by_type[self.index_of(layout)]
+        for placeholder_type in types:
+            if placeholder_type in idx_by_type:
+                return idx_by_type[placeholder_type][0]
+        return None
+
+    def title_idx(self, layout):
+        return self.placeholder_idx(layout, TITLE_TYPES)
+
+    def body_idx(self, layout):
+        return self.placeholder_idx(layout, BODY_TYPES)
+
+    def describe(self):
+        """
+        Describe every layout and its placeholders.
+
+        :return: {position: {"name": name, "placeholders": [{"index": idx, "type": type}]}}
+        """
+        layouts_info = {}
+        for i, layout in enumerate(self.presentation.slide_layouts):
+            layouts_info[i] = {
+                "name": layout.name,
+                "placeholders": [{"index": idx, "type": placeholder_type}
+                                 for idx, placeholder_type in self._placeholders[i]],
+            }
+        return layouts_info
+
+    def _find_role(self, role):
+        for layout_type in ROLE_LAYOUT_TYPES[role]:
+            if layout_type in self._layout_types:
+                return self._layout_types.index(layout_type)
+
+        for i, placeholders in enumerate(self._placeholders):
+            types = {placeholder_type for _, placeholder_type in placeholders} - set(DECORATION_TYPES)
+            has_title = bool(types & set(TITLE_TYPES))
+            has_body = bool(types & set(BODY_TYPES))
+
+            if role == "title_slide" and PP_PLACEHOLDER.CENTER_TITLE in types:
+                return i
+            if role == "title_and_content" and has_title and has_body:
+                return i
+            if role == "title_only" and has_title and types <= set(TITLE_TYPES):
+                return i
+            if role == "blank" and not types:
+                return i
+        return None
@@ -0,0 +1,114 @@
+import math
+from pptx.util import Emu, Inches
+from instrumentation.instrumentation import instrumented, register
+
+# Smallest QR code drawn, whatever its number of modules
+MIN_QR_SIZE = Inches(0.6)
+
+# Smallest size of one QR module on the slide, so dense codes are drawn larger
+MIN_MODULE_SIZE = Inches(0.02)
+
+# Largest QR code drawn, however few options there are
+MAX_QR_SIZE = Inches(1.5)
+
+# Space between the cells of the grid, and between a QR code and its label
+QR_MARGIN = Inches(0.2)
+
+# Narrowest label next to a QR code
+MIN_LABEL_WIDTH = Inches(2)
+
+
+@register
+class QRGridLayout:
+    """
+    Lay out the QR codes of a poll's options, each followed by its label, in a grid over an area
+    of the slide.
+
+    The grid is the one showing the largest codes, between a minimum size readable by phone
+    cameras (given the number of modules of the code) and MAX_QR_SIZE, which codes too dense
+    for it are drawn at. When the options do not all fit on one slide at the minimum size, they
+    are split evenly across as few pages as possible, all laid out the same way. Options are
+    placed down the columns, in order.
+    """
+    @instrumented("qr_grid.layout")
+    def __init__(self, option_count, left, top, width, height, modules=0):
+        """
+        Compute the layout.
+
+        :param option_count: Number of options of the poll
+        :param left: Left position of the area holding the grid
+        :param top: Top position of the area holding the grid
+        :param width: Width of the area holding the grid
+        :param height: Height of the area holding the grid
+        :param modules: Number of modules per side of the QR code, quiet zone included
+        """
+        self.option_count = option_count
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+        self.min_qr_size = max(MIN_QR_SIZE, modules * MIN_MODULE_SIZE)
+        # Codes too dense for MAX_QR_SIZE are drawn at their minimum size
+        self.max_qr_size = max(MAX_QR_SIZE, self.min_qr_size)
+
+        per_page = max(1, option_count)
+        if self._best_grid(per_page) is None:
+            # Fill pages at the minimum size, then balance the options across them
+            page_count = math.ceil(per_page / self._page_capacity())
+            per_page = math.ceil(per_page / page_count)
+
+        # Only a slide too small for a single code has no grid, its one option then overflows
+        self.columns, self.rows, qr_size = self._best_grid(per_page) or (1, per_page, self.min_qr_size)
+        self.qr_size = Emu(int(qr_size))
+        self.cell_width = Emu(int(self._cell_width(self.columns)))
+        self.label_width = Emu(self.cell_width - self.qr_size - QR_MARGIN)
+
+        # Per page, (option index, left, top) of each QR code
+        self.pages = []
+        for first in range(0, option_count, per_page):
+            page = []
+            for position, option in enumerate(range(first, min(first + per_page, option_count))):
+                column, row = divmod(position, self.rows)
+                page.append((option,
+                             Emu(int(left + column * (self.cell_width + QR_MARGIN))),
+                             Emu(int(top + row * (self.qr_size + QR_MARGIN)))))
+            self.pages.append(page)
+        if not self.pages:
+            # A poll without options still gets its slide
+            self.pages.append([])
+
+    def _cell_width(self, columns):
+        return (self.width - (columns - 1) * QR_MARGIN) / columns
+
+    def _qr_size(self, columns, rows):
+        # Limited by the width left for the label in a cell, and by the height of a row
+        size_for_width = self._cell_width(columns) - QR_MARGIN - MIN_LABEL_WIDTH
+        size_for_height = (self.height - (rows - 1) * QR_MARGIN) / rows
+        return min(size_for_width, size_for_height, self.max_qr_size)
+
+    def _best_grid(self, count):
+        """
+        Return (columns, rows, QR size) of the grid holding count options with the largest codes,
+        or None if they do not fit at the minimum size.
+        """
+        best = None
+        for columns in range(1, count + 1):
+            rows = math.ceil(count / columns)
+            size = self._qr_size(columns, rows)
+            # Fewer columns win ties, they keep the labels wide
+            if size >= self.min_qr_size and (best is None or size > best[2]):
+                best = (columns, rows, size)
+        return best
+
+    def _page_capacity(self):
+        # Most options a page holds at the minimum size, by the same size rule as _best_grid so
+        # that a page of this many options always has a grid
+        capacity = 0
+        columns = 1
+        while self._qr_size(columns, 1) >= self.min_qr_size:
+            rows = int((self.height + QR_MARGIN) // (self.min_qr_size + QR_MARGIN)) + 1
+            while rows > 0 and self._qr_size(columns, rows) < self.min_qr_size:
+                rows -= 1
+            capacity = max(capacity, columns * rows)
+            columns += 1
+        return max(1, capacity)
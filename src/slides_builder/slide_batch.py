@@ -0,0 +1,150 @@
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.packuri import PackURI
+from pptx.parts.slide import SlidePart
+from instrumentation.instrumentation import instrumented, register
+
+
+@register
+class SlideBatch:
+    """
+    Queue slide inserts, moves and deletes and apply them as a single reorder of the deck.
+
+    New slides are created right away (so they can be filled in), but the slide order in the
+    presentation's sldIdLst is only rewritten once, when the batch is committed. Indexes passed
+    to insert, move and delete always refer to the order the deck would have if every previous
+    operation of the batch had already been applied: slides inserted earlier in the batch are
+    counted and slides deleted earlier are not.
+
+    Slides are also created without python-pptx's per-slide scans of the presentation's
+    relationships and slide ids, so adding k slides to an n-slide deck costs O(k + n).
+    """
+    def __init__(self, presentation):
+        """
+        Start a batch on a presentation.
+
+        :param presentation: The python-pptx Presentation to reorder
+        """
+        self.presentation = presentation
+
+        self._sld_id_lst = presentation.slides._sldIdLst  # pylint: disable=protected-access
+        self._order = list(self._sld_id_lst)
+        self._next_slide_id = max([255] + [sld_id.id for sld_id in self._order]) + 1
+        self._inserted = []
+        self._deleted = []
+        self.closed = False
+
+    def __len__(self):
+        return len(self._order)
+
+    def insert(self, slide_layout, slide_index=None):
+        """
+        Add a new slide at an index of the pending order.
+
+        :param slide_layout: The layout to use for the new slide
+        :param slide_index: The index at which to insert the new slide, None to append it
+        :return: The newly inserted slide object
+        """
+        self._check_open()
+        slide_part = SlidePart.new(self.next_partname(), self.presentation.part.package, slide_layout.part)
+        slide_part.slide.shapes.clone_layout_placeholders(slide_layout)
+        return self.insert_part(slide_part, slide_index)
+
+    def insert_part(self, slide_part, slide_index=None):
+        """
+        Add an already built slide part at an index of the pending order.
+
+        :param slide_part: A new SlidePart named with next_partname(), related to its layout
+        :param slide_index: The index at which to insert the new slide, None to append it
+        :return: The newly inserted slide object
+        """
+        self._check_open()
+        sld_id = self._add_slide_part(slide_part)
+
+        if slide_index is None:
+            slide_index = len(self._order)
+        slide_index = max(0, min(slide_index, len(self._order)))
+
+        self._order.insert(slide_index, sld_id)
+        self._inserted.append(sld_id)
+        return slide_part.slide
+
+    def next_partname(self):
+        """
+        Return the partname the next slide added to the deck gets.
+
+        :return: PackURI of the next slide part
+        """
+        return PackURI("/ppt/slides/slide%d.xml" % (len(self._sld_id_lst) + 1))
+
+    def move(self, old_index, new_index):
+        """
+        Move a slide within the pending order.
+
+        :param old_index: Current index of the slide
+        :param new_index: Index the slide should end up at
+        """
+        self._check_open()
+        sld_id = self._order.pop(old_index)
+        self._order.insert(new_index, sld_id)
+
+    def delete(self, slide_index):
+        """
+        Remove a slide from the pending order; it is dropped from the deck on commit.
+
+        :param slide_index: Index of the slide to delete
+        """
+        self._check_open()
+        self._deleted.append(self._order.pop(slide_index))
+
+    @instrumented("batch.commit")
+    def commit(self):
+        """
+        Apply the pending order to the presentation in one pass.
+        """
+        self._check_open()
+        self.closed = True
+
+        # Slides appended to the deck outside of the batch keep their place at the end
+        known = set(self._order)
+        known.update(self._deleted)
+        order = self._order + [sld_id for sld_id in self._sld_id_lst if sld_id not in known]
+
+        for sld_id in self._deleted:
+            self.presentation.part.drop_rel(sld_id.rId)
+
+        self._replace_order(order)
+
+    def rollback(self):
+        """
+        Drop the slides inserted by the batch and leave the deck in its original order.
+        """
+        self._check_open()
+        self.closed = True
+
+        inserted = set(self._inserted)
+        for sld_id in self._inserted:
+            self.presentation.part.drop_rel(sld_id.rId)
+
+        self._replace_order([sld_id for sld_id in self._sld_id_lst if sld_id not in inserted])
+
+    def _add_slide_part(self, slide_part):
+        # Same steps as python-pptx's Slides.add_slide, minus the linear scans.
+        # A brand new part cannot be related yet, so there is no existing relationship to look up
+        rId = self.presentation.part.rels._add_relationship(RT.SLIDE, slide_part)  # pylint: disable=protected-access
+
+        sld_id = self._sld_id_lst._add_sldId(id=self._next_slide_id, rId=rId)  # pylint: disable=protected-access
+        self._next_slide_id += 1
+        return sld_id
+
+    def _replace_order(self, order):
+        sld_id_lst = self._sld_id_lst
+        for sld_id in list(sld_id_lst):
+            sld_id_lst.remove(sld_id)
+        sld_id_lst.extend(order)
+
+        # python-pptx names new slides after the slide count, so keep the partnames contiguous
+        self.presentation.part.rename_slide_parts([sld_id.rId for sld_id in order])
+
+    def _check_open(self):
+        if self.closed:
+            raise ValueError("The slide batch was already committed or rolled back")
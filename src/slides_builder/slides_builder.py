@@ -1,19 +1,71 @@
 from pptx import Presentation
 from pptx.util import Inches, Pt
 from pptx.enum.shapes import MSO_SHAPE
-from io import BytesIO
-from content_generators.qr_generator import QRGenerator
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.opc.packuri import PackURI
+from pptx.parts.image import Image, ImagePart
+from pptx.dml.color import RGBColor
+from pptx.oxml import parse_xml
+from pptx.oxml.ns import nsdecls
+from contextlib import contextmanager, nullcontext
+from content_generators.qr_generator import ERROR_CORRECT_M, QRGenerator
+from instrumentation.instrumentation import instrumented, output_file_size, register
+from loaders.slide_metadata import parse_metadata_payloads
+from slides_builder.compiled_slide import CompiledSlide
+from slides_builder.incremental_writer import IncrementalPackageWriter
+from slides_builder.layout_index import LayoutIndex
+from slides_builder.qr_grid import QR_MARGIN, QRGridLayout
+from slides_builder.slide_batch import SlideBatch
+import hashlib
 import json
+import os
+import weakref
 
+# Area of the slides add_qr_slide lays its QR codes out in
+QR_AREA_LEFT = Inches(0.5)
+QR_AREA_TOP = Inches(1.5)
+QR_AREA_BOTTOM_MARGIN = Inches(0.5)
+
+@register
 class SlidesBuilder:
-    def __init__(self, pptx_file):
+    @instrumented("builder.load_template")
+    def __init__(self, pptx_file, template_pool=None, image_ingestor=None):
         """
         Initialize the SlidesBuilder with a PowerPoint file.
 
         :param pptx_file: Path to the PowerPoint file
+        :param template_pool: Optional TemplatePool to take a parsed copy of the file from
+        :param image_ingestor: Optional ImageIngestor downscaling and re-encoding the images of
+                               add_full_slide_image; images are embedded as they are if None
         """
         # Should auto apply the presentation layout to the new slides added
-        self.presentation = Presentation(pptx_file)
+        if template_pool is not None:
+            self.presentation = template_pool.get(pptx_file)
+        else:
+            self.presentation = Presentation(pptx_file)
+
+        # Image parts of the package keyed by the SHA1 of the image bytes, indexed on first use,
+        # and the number of the next /ppt/media/imageN part
+        self._image_parts = None
+        self._next_image_idx = 1
+        self.image_ingestor = image_ingestor
+
+        # Layouts by name and role, and their title and content placeholders
+        self.layouts = LayoutIndex(self.presentation)
+
+        # The SlideBatch collecting slide order changes, if one is open
+        self._batch = None
+
+        # Where the deck was loaded from and the partname each part had there, so that
+        # save(incremental=True) can copy the parts no builder operation touched
+        self._source_file = None
+        self._source_signature = None
+        if isinstance(pptx_file, (str, os.PathLike)):
+            self._source_file = os.path.realpath(pptx_file)
+            self._source_signature = self._file_signature(self._source_file)
+        self._original_partnames = weakref.WeakKeyDictionary(
+            (part, part.partname) for part in self.presentation.part.package.iter_parts())
+        self._dirty_parts = weakref.WeakSet()
         
     def inspect_slide_layouts(self):
         """
@@ -21,43 +73,34 @@ class SlidesBuilder:
         
         :return: Information about the slide layouts in the presentation
         """
-        layouts_info = {}
-
-        for i, layout in enumerate(self.presentation.slide_layouts):
-            layout_info = {'name': layout.name, 'placeholders': []}
-            for placeholder in layout.placeholders:
-                layout_info['placeholders'].append({
-                    'index': placeholder.placeholder_format.idx,
-                    'type': placeholder.placeholder_format.type
-                })
-            layouts_info[i] = layout_info
-
-        return layouts_info
+        return self.layouts.describe()
 
+    @instrumented("builder.add_slide")
     def add_slide(self, layout_idx=1, title="New Slide", content=""):
         """
         Add a new slide to the presentation with a title and content.
 
+        :param layout_idx: Position or name of the slide layout to use
         :param title: Title of the new slide
         :param content: Content of the new slide
         :return: The new slide
         """
-        # Use the first slide layout by default (typically a title slide)
-        slide_layout = self.presentation.slide_layouts[layout_idx]
+        # Use the second slide layout by default (typically title and content)
+        slide_layout = self.layouts.layout(layout_idx)
 
         # Add a slide
-        slide = self.presentation.slides.add_slide(slide_layout)
+        slide = self.new_slide(slide_layout)
 
         # Set the title and content if placeholders are available
-        if slide.shapes.title:
-            slide.shapes.title.text = title
+        title_placeholder, content_placeholder = self.title_and_content_placeholders(slide, slide_layout)
+        if title_placeholder is not None:
+            title_placeholder.text = title
+        if content_placeholder is not None:
+            content_placeholder.text = content
 
-        for shape in slide.placeholders:
-            if shape.placeholder_format.idx == 1:
-                shape.text = content
-                
         return slide
 
+    @instrumented("builder.add_slide_with_title_and_content")
     def add_slide_with_title_and_content(self, title, content, slide_index=None):
         """
         Add a slide with a title at the top and content following.
@@ -66,25 +109,14 @@ class SlidesBuilder:
         :param content: Content of the slide
         :return: The new slide
         """
-        slide_layout = self.presentation.slide_layouts[1]  # A layout with title and content placeholders
+        # A layout with title and content placeholders
+        slide_layout = self.layouts.layout_for_role("title_and_content", self.presentation.slide_layouts[1])
         
         # Add a slide at the specified index, if provided
-        if slide_index is not None and 0 <= slide_index <= len(self.presentation.slides):
-            # This is a placeholder for the desired functionality
-            # Actual implementation would depend on extending python-pptx or using a workaround
-            slide = self.insert_slide_at_index(slide_layout, slide_index)
-        else:
-            # Add the slide at the end if no index is specified or if the index is out of range
-            slide = self.presentation.slides.add_slide(slide_layout)
+        slide = self.new_slide(slide_layout, slide_index)
         
         # Assign the title and content if the placeholders exist
-        title_placeholder = slide.shapes.title
-        content_placeholder = None
-
-        for placeholder in slide.placeholders:
-            if placeholder.placeholder_format.type == "BODY":
-                content_placeholder = placeholder
-                break
+        title_placeholder, content_placeholder = self.title_and_content_placeholders(slide, slide_layout)
 
         if title_placeholder is not None:
             title_placeholder.text = title
@@ -103,15 +135,64 @@ class SlidesBuilder:
             
         return slide
 
+    def title_and_content_placeholders(self, slide, slide_layout):
+        """
+        Find the placeholders of a new slide that hold its title and its content.
+
+        :param slide: A slide created from slide_layout
+        :param slide_layout: The layout the slide was created from
+        :return: (title placeholder, content placeholder), either one None if the layout has none
+        """
+        title_idx = self.layouts.title_idx(slide_layout)
+        content_idx = self.layouts.body_idx(slide_layout)
+        if title_idx is None and content_idx is None:
+            return None, None
+
+        placeholders = {placeholder.placeholder_format.idx: placeholder for placeholder in slide.placeholders}
+        return placeholders.get(title_idx), placeholders.get(content_idx)
+
+    def new_slide(self, slide_layout, slide_index=None):
+        """
+        Add a new slide at a specific index, or at the end of the presentation.
+
+        :param slide_layout: The layout to use for the new slide.
+        :param slide_index: The index at which to insert the new slide, the slide is added at the
+                            end if it is None or out of range.
+        :return: The new slide object.
+        """
+        if slide_index is not None and 0 <= slide_index <= self.slide_count():
+            return self.insert_slide_at_index(slide_layout, slide_index)
+
+        # Add the slide at the end if no index is specified or if the index is out of range
+        if self._batch is not None:
+            return self._batch.insert(slide_layout)
+        return self.presentation.slides.add_slide(slide_layout)
+
+    def slide_count(self):
+        """
+        Number of slides in the presentation, including the pending changes of an open batch.
+
+        :return: The number of slides
+        """
+        if self._batch is not None:
+            return len(self._batch)
+        return len(self.xml_slides())
+
+    @instrumented("builder.insert_slide_at_index")
     def insert_slide_at_index(self, slide_layout, slide_index):
         """
         Insert a slide at a specific index. This is a workaround method that creates a new presentation,
         copies slides to it, and inserts the new slide at the desired position.
 
+        Inside a batch (see batch()) the slide is created right away but only moved into place when
+        the batch is committed.
+
         :param slide_layout: The layout to use for the new slide.
         :param slide_index: The index at which to insert the new slide.
         :return: The newly inserted slide object.
         """
+        if self._batch is not None:
+            return self._batch.insert(slide_layout, slide_index)
         
         # Ensure the slide index is within bounds
         slide_index = max(0, min(slide_index, len(self.presentation.slides)))
@@ -128,13 +209,63 @@ class SlidesBuilder:
     def xml_slides(self):
         return self.presentation.slides._sldIdLst  # pylint: disable=protected-access
 
+    @instrumented("builder.move_slide")
     def move_slide(self, old_index, new_index):
+        if self._batch is not None:
+            self._batch.move(old_index, new_index)
+            return
+
         xml_slides_info = self.xml_slides()
         slides = list(xml_slides_info)
         xml_slides_info.remove(slides[old_index])
         xml_slides_info.insert(new_index, slides[old_index])
 
+    @instrumented("builder.delete_slide")
+    def delete_slide(self, slide_index):
+        """
+        Delete the slide at a specific index.
+
+        :param slide_index: Index of the slide to delete
+        """
+        if self._batch is not None:
+            self._batch.delete(slide_index)
+            return
+
+        xml_slides_info = self.xml_slides()
+        sld_id = list(xml_slides_info)[slide_index]
+        xml_slides_info.remove(sld_id)
+        self.presentation.part.drop_rel(sld_id.rId)
+
+        # python-pptx names new slides after the slide count, so keep the partnames contiguous
+        self.presentation.part.rename_slide_parts([sld_id.rId for sld_id in xml_slides_info])
 
+    @contextmanager
+    def batch(self):
+        """
+        Collect slide inserts, moves and deletes and apply them as a single reorder of the deck.
+
+        Inside the with block every method adding, moving or deleting slides goes through the
+        batch, which is committed when the block exits, or rolled back if it raises. Indexes
+        refer to the deck as if every previous change of the batch had already been applied.
+
+        :return: Context manager yielding the SlideBatch
+        """
+        if self._batch is not None:
+            raise ValueError("A slide batch is already open on this builder")
+
+        self._batch = SlideBatch(self.presentation)
+        try:
+            yield self._batch
+        except BaseException:
+            self._batch.rollback()
+            raise
+        else:
+            self._batch.commit()
+        finally:
+            self._batch = None
+
+
+    @instrumented("builder.safe_add_slide_with_title_and_content")
     def safe_add_slide_with_title_and_content(self, title, content, slide_index=None):
         """
         Add a slide with a title at the top and content following, using default positions if specific placeholders are not found.
@@ -144,33 +275,24 @@ class SlidesBuilder:
         :param slide_index: Index of the slide to add
         :return: The new slide
         """
-        try:
-            # Attempt to use a layout with title and content placeholders
-            slide_layout = self.presentation.slide_layouts[1]
-        except IndexError:
-            # If the specified layout does not exist, use the default blank layout
-            slide_layout = self.presentation.slide_layouts[5]  # Typically, index 5 is a blank layout
+        # Attempt to use a layout with title and content placeholders
+        slide_layout = self.layouts.layout_for_role("title_and_content")
+        if slide_layout is None:
+            # If the template has none, use the blank layout
+            slide_layout = self.layouts.layout_for_role("blank", self.presentation.slide_layouts[0])
 
         # Add a slide at the specified index, if provided
-        if slide_index is not None and 0 <= slide_index <= len(self.presentation.slides):
-            # This is a placeholder for the desired functionality
-            # Actual implementation would depend on extending python-pptx or using a workaround
-            slide = self.insert_slide_at_index(slide_layout, slide_index)
-        else:
-            # Add the slide at the end if no index is specified or if the index is out of range
-            slide = self.presentation.slides.add_slide(slide_layout)
+        slide = self.new_slide(slide_layout, slide_index)
         
         # Attempt to assign the title and content if the placeholders exist
-        title_placeholder_found = False
-        content_placeholder_found = False
+        title_placeholder, content_placeholder = self.title_and_content_placeholders(slide, slide_layout)
+        title_placeholder_found = title_placeholder is not None
+        content_placeholder_found = content_placeholder is not None
 
-        for placeholder in slide.placeholders:
-            if placeholder.placeholder_format.type == "TITLE":
-                placeholder.text = title
-                title_placeholder_found = True
-            elif placeholder.placeholder_format.type == "BODY":
-                placeholder.text = content
-                content_placeholder_found = True
+        if title_placeholder_found:
+            title_placeholder.text = title
+        if content_placeholder_found:
+            content_placeholder.text = content
 
         # If title placeholder is not found, add a textbox for the title
         if not title_placeholder_found and title:
@@ -188,46 +310,126 @@ class SlidesBuilder:
 
         return slide
                 
-    def add_qr_slide(self, qr_data, text_dict, slide_title, slide_content="", slide_index=None):
+    @instrumented("builder.add_qr_slide")
+    def add_qr_slide(self, qr_data, text_dict, slide_title, slide_content="", slide_index=None, vector=False):
         """
         Add a slide with specified number of QR codes containing the given data
         and corresponding text next to each QR code.
 
+        The codes are laid out in a grid sized to the slide (see QRGridLayout). Options that do
+        not fit on one slide go to continuation slides following it, titled "<title> (2/3)" etc.
+
         :param qr_data: Data to be encoded in the QR codes
         :param text_dict: Dictionary with index and text for each QR code
         :param slide_title: Title of the new slide
-        :param slide_content: Content of the new slide
+        :param slide_content: Content of the new slide, shown on the first slide only
         :param slide_index: Index of the slide to add
+        :param vector: Draw the QR codes as native shapes instead of embedding PNG images
+        :return: List of the new slides, a single one unless the options span several pages
         """
-        slide = self.add_slide_with_title_and_content(slide_title, slide_content, slide_index)
-
-        # Define size and spacing
-        qr_size = Inches(0.6)  # Size of each QR code
-        qr_margin = Inches(0.2)  # Margin between QR codes
-        max_qr = min(len(text_dict), 4)  # Limit the number of QR codes to 4 or the number of items in text_dict
-
-        # Assuming QR codes are placed in the content area
-        content_top = Inches(1.5)  # Starting position for QR codes
-        content_left = Inches(0.5)  # Left margin for QR codes
-
-        for i in range(max_qr):
-            # Calculate position for QR code
-            top = content_top + i * (qr_size + qr_margin)
-
-            # Generate and add QR code to slide
-            qr_img = QRGenerator.generate_qr_code(json.dumps(qr_data))
-            qr_bytes = BytesIO()
-            qr_img.save(qr_bytes)
-            qr_bytes.seek(0)
-
-            slide.shapes.add_picture(qr_bytes, content_left, top, qr_size, qr_size)
+        # The payload is the same for every option, so encode it once (cached across slides)
+        payload = json.dumps(qr_data)
+        qr_png = None if vector else QRGenerator.generate_qr_png(payload)
+        grid = self.qr_grid(len(text_dict), payload)
+
+        slides = []
+        # All the pages are added in a single reorder of the deck
+        with self.batch() if self._batch is None else nullcontext():
+            for page_number, page in enumerate(grid.pages):
+                title = slide_title
+                if len(grid.pages) > 1:
+                    title = f"{slide_title} ({page_number + 1}/{len(grid.pages)})"
+                index = None if slide_index is None else slide_index + page_number
+                slide = self.add_slide_with_title_and_content(title, slide_content if page_number == 0 else "", index)
+
+                for i, left, top in page:
+                    if vector:
+                        self.add_qr_shape(slide, payload, left, top, grid.qr_size)
+                    else:
+                        # Add QR code to slide, sharing one media part for identical images
+                        self.add_shared_picture(slide, qr_png, left, top, grid.qr_size, grid.qr_size)
+
+                    # Add a textbox for each QR code
+                    if i in text_dict:
+                        textbox = slide.shapes.add_textbox(left + grid.qr_size + QR_MARGIN, top,
+                                                           grid.label_width, grid.qr_size)
+                        textbox.text_frame.word_wrap = True
+                        textbox.text = text_dict[i]
+                slides.append(slide)
+
+        return slides
+
+    def qr_grid(self, option_count, payload):
+        """
+        Lay out the QR codes of a poll on this deck's slides, see QRGridLayout.
 
-            # Add a textbox for each QR code
-            if i in text_dict:
-                textbox = slide.shapes.add_textbox(content_left + qr_size + qr_margin, top,
-                                                   Inches(3), qr_size)
-                textbox.text = text_dict[i]
-                
+        :param option_count: Number of options of the poll
+        :param payload: Data encoded in the QR codes, which sets their minimum size
+        :return: A QRGridLayout
+        """
+        # QR codes are placed in the content area, below the title
+        left = QR_AREA_LEFT
+        top = QR_AREA_TOP
+        width = self.presentation.slide_width - 2 * QR_AREA_LEFT
+        height = self.presentation.slide_height - QR_AREA_TOP - QR_AREA_BOTTOM_MARGIN
+        modules = len(QRGenerator.generate_qr_matrix(payload))
+        return QRGridLayout(option_count, left, top, width, height, modules)
+
+    @instrumented("builder.add_qr_shape")
+    def add_qr_shape(self, slide, data, left, top, size, error_correction=ERROR_CORRECT_M, border=4):
+        """
+        Draw a QR code as a native freeform shape instead of an embedded image.
+
+        The dark modules are merged into rectangles and written as the sub-paths of a single
+        custom geometry over a white background square, so the code stays sharp at any
+        resolution and adds no media part to the deck.
+
+        :param slide: The slide object to draw the QR code on
+        :param data: Data to be encoded in the QR code
+        :param left: Left position of the QR code
+        :param top: Top position of the QR code
+        :param size: Width and height of the QR code, including the quiet zone
+        :param error_correction: One of the qrcode.constants.ERROR_CORRECT_* levels
+        :param border: Width of the quiet zone in modules
+        :return: The freeform shape holding the dark modules
+        """
+        matrix = QRGenerator.generate_qr_matrix(data, error_correction, border)
+        modules = len(matrix)
+        self.mark_part_dirty(slide)
+
+        # The quiet zone has to be light even on dark slide backgrounds
+        background = slide.shapes.add_shape(MSO_SHAPE.RECTANGLE, left, top, size, size)
+        background.fill.solid()
+        background.fill.fore_color.rgb = RGBColor(0xFF, 0xFF, 0xFF)
+        background.line.fill.background()
+        background.shadow.inherit = False
+
+        # One path in module units, scaled to the shape extents by PowerPoint
+        commands = []
+        for x, y, width, height in QRGenerator.qr_rectangles(matrix):
+            commands.append(
+                f'<a:moveTo><a:pt x="{x}" y="{y}"/></a:moveTo>'
+                f'<a:lnTo><a:pt x="{x + width}" y="{y}"/></a:lnTo>'
+                f'<a:lnTo><a:pt x="{x + width}" y="{y + height}"/></a:lnTo>'
+                f'<a:lnTo><a:pt x="{x}" y="{y + height}"/></a:lnTo>'
+                '<a:close/>'
+            )
+        path = parse_xml(f'<a:path {nsdecls("a")} w="{modules}" h="{modules}">{"".join(commands)}</a:path>')
+
+        shapes = slide.shapes
+        sp = shapes._spTree.add_freeform_sp(left, top, size, size)  # pylint: disable=protected-access
+        sp.spPr.custGeom.get_or_add_pathLst().append(path)
+        shapes._recalculate_extents()  # pylint: disable=protected-access
+
+        qr_shape = shapes._shape_factory(sp)  # pylint: disable=protected-access
+        qr_shape.name = "QR Code"
+        qr_shape.fill.solid()
+        qr_shape.fill.fore_color.rgb = RGBColor(0, 0, 0)
+        qr_shape.line.fill.background()
+        qr_shape.shadow.inherit = False
+        return qr_shape
+
+    @instrumented("builder.add_full_slide_image")
     def add_full_slide_image(self, image_path, layout_idx=6, slide_index=None):
         """
         Add a new slide to the presentation with an image covering the entire slide.
@@ -241,23 +443,130 @@ class SlidesBuilder:
         slide_layout = self.presentation.slide_layouts[layout_idx]
 
         # Add a slide at the specified index, if provided
-        if slide_index is not None and 0 <= slide_index <= len(self.presentation.slides):
-            # This is a placeholder for the desired functionality
-            # Actual implementation would depend on extending python-pptx or using a workaround
-            slide = self.insert_slide_at_index(slide_layout, slide_index)
-        else:
-            # Add the slide at the end if no index is specified or if the index is out of range
-            slide = self.presentation.slides.add_slide(slide_layout)
+        slide = self.new_slide(slide_layout, slide_index)
 
         # Get slide dimensions
         slide_width = self.presentation.slide_width
         slide_height = self.presentation.slide_height
 
         # Add the image to cover the entire slide
-        slide.shapes.add_picture(image_path, 0, 0, slide_width, slide_height)
+        if self.image_ingestor is not None:
+            # Embed the image at slide resolution, once per deck however many slides show it
+            image_bytes = self.image_ingestor.ingest(image_path, slide_width, slide_height)
+            self.add_shared_picture(slide, image_bytes, 0, 0, slide_width, slide_height)
+        else:
+            # Through the builder's image index rather than add_picture, which scans the package
+            # and would not know about the parts the index adds
+            if isinstance(image_path, (str, os.PathLike)):
+                with open(image_path, "rb") as image_file:
+                    image_bytes = image_file.read()
+                filename = os.path.basename(image_path)
+            else:
+                image_bytes, filename = image_path.read(), None
+            self.add_shared_picture(slide, image_bytes, 0, 0, slide_width, slide_height, filename)
 
         return slide
     
+    @instrumented("builder.add_shared_picture", size=lambda result, self, slide, image_bytes, *args, **kwargs: len(image_bytes))
+    def add_shared_picture(self, slide, image_bytes, left, top, width=None, height=None, filename=None):
+        """
+        Add a picture from in-memory image bytes, reusing a single media part for identical images.
+
+        python-pptx walks every relationship in the package on each add_picture call, to look
+        up an identical image and again to name a new one, which gets slow on large decks. Here
+        the image parts are looked up by SHA1 in an index built once (see shared_image_part), so
+        adding an image costs O(1) however many the deck already has.
+
+        :param slide: The slide object to add the picture to
+        :param image_bytes: Encoded image bytes (e.g. PNG)
+        :param left: Left position of the picture
+        :param top: Top position of the picture
+        :param width: Width of the picture, native width if None
+        :param height: Height of the picture, native height if None
+        :param filename: Optional file name of the image, used as the picture's description
+        :return: The new picture shape
+        """
+        self.mark_part_dirty(slide)
+        image_part = self.shared_image_part(image_bytes, filename)
+
+        # relate_to reuses the relationship if the slide already references this part
+        rId = slide.part.relate_to(image_part, RT.IMAGE)
+        shapes = slide.shapes
+        pic = shapes._add_pic_from_image_part(image_part, rId, left, top, width, height)  # pylint: disable=protected-access
+        shapes._recalculate_extents()  # pylint: disable=protected-access
+        return shapes._shape_factory(pic)  # pylint: disable=protected-access
+
+    def shared_image_part(self, image_bytes, filename=None):
+        """
+        Return the image part holding an image, adding it to the package the first time.
+
+        The image parts of the package are indexed by SHA1 on first use, and new parts are named
+        from a counter, so neither lookups nor new images scan the package again. Images added
+        with python-pptx's add_picture afterwards are not seen by the index.
+
+        :param image_bytes: Encoded image bytes (e.g. PNG)
+        :param filename: Optional file name of the image, used as the description of its pictures
+        :return: The ImagePart
+        """
+        package = self.presentation.part.package
+        if self._image_parts is None:
+            self._image_parts = {}
+            for part in package.iter_parts():
+                if isinstance(part, ImagePart):
+                    self._image_parts.setdefault(part.sha1, part)
+                    if part.partname.startswith("/ppt/media/image") and part.partname.idx is not None:
+                        self._next_image_idx = max(self._next_image_idx, part.partname.idx + 1)
+
+        sha1 = hashlib.sha1(image_bytes).hexdigest()
+        image_part = self._image_parts.get(sha1)
+        if image_part is None:
+            image = Image.from_blob(image_bytes, filename)
+            partname = PackURI(f"/ppt/media/image{self._next_image_idx}.{image.ext}")
+            self._next_image_idx += 1
+            image_part = ImagePart(partname, image.content_type, package, image_bytes, filename)
+            self._image_parts[sha1] = image_part
+        return image_part
+
+    @instrumented("builder.compile_slide")
+    def compile_slide(self, slide, image_fields=None):
+        """
+        Record a slide as a template for stamping out slides of the same structure, see CompiledSlide.
+
+        :param slide: The prototype slide, with {name} markers in the texts that change
+        :param image_fields: Optional dict of field name -> picture shape(s) whose image changes
+        :return: A CompiledSlide
+        """
+        return CompiledSlide(self, slide, image_fields)
+
+    def compile_qr_slide(self, option_count, sample_data, slide_title="{title}", slide_content="{content}"):
+        """
+        Compile the slides of a QR poll, laid out and paged like add_qr_slide's.
+
+        The codes are sized for sample_data, which should be the longest data the stamped codes
+        encode: denser codes need more room and may split the options across more pages. Each
+        page is compiled to its own template, to stamp in order for every poll. The templates
+        have the text fields option0 to option<option_count - 1> of their page (plus title and
+        content unless fixed texts are given) and the image field qr, the PNG shown for every option.
+
+        :param option_count: Number of options of the poll
+        :param sample_data: Data to size the QR codes for, encoded like add_qr_slide's qr_data
+        :param slide_title: Title of the slides, "{title}" to set it per slide
+        :param slide_content: Content of the first slide, "{content}" to set it per slide
+        :return: List of CompiledSlide, one per page of the poll
+        """
+        text_dict = {i: "{option%d}" % i for i in range(option_count)}
+
+        # Build the prototype pages at the end of the deck, record them and drop them again
+        prototypes = self.add_qr_slide(sample_data, text_dict, slide_title, slide_content)
+        compiled = []
+        for prototype in prototypes:
+            qr_pictures = [shape for shape in prototype.shapes if shape.shape_type == 13]  # This is the type for Picture
+            compiled.append(self.compile_slide(prototype, {"qr": qr_pictures}))
+        for _ in prototypes:
+            self.delete_slide(self.slide_count() - 1)
+        return compiled
+
+    @instrumented("builder.append_notes_to_slide")
     def append_notes_to_slide(self, slide, notes, delimiter="###"):
         """
         Append notes to a slide's notes page, using a new paragraph to preserve existing formatting.
@@ -269,6 +578,8 @@ class SlidesBuilder:
 
         # Access the text frame of the notes slide
         text_frame = slide.notes_slide.notes_text_frame
+        self.mark_part_dirty(slide)
+        self.mark_part_dirty(slide.notes_slide)
 
         
         # Add a new paragraph with delimiter and content
@@ -277,11 +588,102 @@ class SlidesBuilder:
         new_paragraph.text += notes        
         new_paragraph.text += delimiter
 
-    def save(self, output_file):
+    @instrumented("builder.set_slide_metadata")
+    def set_slide_metadata(self, slide, key, value, delimiter="###"):
+        """
+        Store a JSON-serializable value under a key in the slide's notes.
+
+        Each key is kept as its own delimited {key: value} paragraph, so setting a key again
+        replaces its paragraph instead of appending another one.
+
+        :param slide: The slide object to store the metadata on
+        :param key: Metadata key
+        :param value: JSON-serializable value
+        :param delimiter: A string delimiter to separate different sections of notes
+        """
+        payload = json.dumps({key: value})
+
+        if slide.has_notes_slide:
+            for paragraph in slide.notes_slide.notes_text_frame.paragraphs:
+                text = paragraph.text
+                if not (text.startswith(delimiter) and text.endswith(delimiter)):
+                    continue
+                stored = parse_metadata_payloads(text, delimiter, delimiter)
+                if len(stored) == 1 and isinstance(stored[0], dict) and list(stored[0]) == [key]:
+                    paragraph.text = delimiter + payload + delimiter
+                    self.mark_part_dirty(slide.notes_slide)
+                    return
+
+        self.append_notes_to_slide(slide, payload, delimiter)
+
+    @staticmethod
+    def get_slide_metadata(slide, key, default=None, delimiter="###"):
+        """
+        Read the value stored under a key in the slide's notes.
+
+        :param slide: The slide object to read the metadata from
+        :param key: Metadata key
+        :param default: Value returned if the key is not found
+        :param delimiter: A string delimiter to separate different sections of notes
+        :return: The value of the last payload carrying the key
+        """
+        if not slide.has_notes_slide:
+            return default
+
+        notes_text = slide.notes_slide.notes_text_frame.text
+        for payload in reversed(parse_metadata_payloads(notes_text, delimiter, delimiter)):
+            if isinstance(payload, dict) and key in payload:
+                return payload[key]
+        return default
+
+    def mark_part_dirty(self, part):
+        """
+        Record that a part was modified, so an incremental save writes it instead of copying it.
+
+        Builder methods mark the parts they change themselves; call this after modifying a
+        slide, notes slide or layout loaded from the file directly through python-pptx.
+
+        :param part: A python-pptx part, or an object with a part (e.g. a slide or notes slide)
+        """
+        self._dirty_parts.add(getattr(part, "part", part))
+
+    @instrumented("builder.save", size=output_file_size)
+    def save(self, output_file, incremental=False):
         """
         Save the updated presentation to a new file.
 
-        :param output_file: Path to save the updated PowerPoint file
+        An incremental save copies the compressed members of the parts that were not modified
+        straight from the file the deck was loaded from, so its cost depends on the size of the
+        changes rather than of the deck. It falls back to a full save when the deck was not
+        loaded from a path, the file changed since, or it is the file being written.
+
+        :param output_file: Path to save the updated PowerPoint file, or a seekable file-like object
+        :param incremental: Copy the unmodified parts from the source file instead of re-serializing them
         """
-        self.presentation.save(output_file)
-    
\ No newline at end of file
+        if not (incremental and self._can_copy_from_source(output_file)):
+            self.presentation.save(output_file)
+            return
+
+        # The slide list, notes master and section references all live in the presentation part
+        dirty_parts = set(self._dirty_parts)
+        dirty_parts.add(self.presentation.part)
+
+        package = self.presentation.part.package
+        IncrementalPackageWriter.write(output_file, package._rels, tuple(package.iter_parts()),  # pylint: disable=protected-access
+                                       self._source_file, self._original_partnames, dirty_parts)
+
+    def _can_copy_from_source(self, output_file):
+        if self._source_file is None or self._file_signature(self._source_file) != self._source_signature:
+            return False
+        if isinstance(output_file, (str, os.PathLike)):
+            # Writing over the source would truncate it before its members are copied
+            return os.path.realpath(output_file) != self._source_file
+        return hasattr(output_file, "seek")
+
+    @staticmethod
+    def _file_signature(path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
@@ -0,0 +1,133 @@
+"""
+Resident deck worker that keeps its imports and parsed templates hot between jobs.
+
+The worker reads one deck spec per line (see slides_builder.bulk) and writes one JSON result
+per line, in the same order. Specs may carry an "id" that is echoed back in the result. Decks
+of specs without an "output" path are returned base64 encoded under "bytes".
+
+Run from the src directory, either on stdin/stdout:
+
+    python -m slides_builder.worker --warm ../tests/inputs/test2.pptx
+
+or on a local Unix socket, serving every connection the same line protocol:
+
+    python -m slides_builder.worker --socket /tmp/ppt-worker.sock
+"""
+import argparse
+import base64
+import json
+import os
+import signal
+import socketserver
+import sys
+from content_generators.qr_generator import QRGenerator
+from loaders.template_pool import TemplatePool
+from slides_builder.bulk import run_job
+
+
+def warm_up(template_pool, templates=()):
+    """
+    Pay the one-off startup costs before the first job arrives.
+
+    :param template_pool: TemplatePool to parse the templates into
+    :param templates: Paths of the templates to parse
+    """
+    # Encoding a code imports qrcode and builds its lookup tables
+    QRGenerator.generate_qr_matrix("warm-up")
+
+    for template in templates:
+        template_pool.get(template)
+
+
+def handle_line(line, template_pool):
+    """
+    Build the deck of one request line.
+
+    :param line: A JSON deck spec
+    :param template_pool: TemplatePool the templates are taken from
+    :return: The JSON result line, without the trailing newline
+    """
+    try:
+        spec = json.loads(line)
+    except ValueError as error:
+        return json.dumps({"id": None, "error": f"{type(error).__name__}: {error}"})
+    if not isinstance(spec, dict):
+        return json.dumps({"id": None, "error": "TypeError: a deck spec must be a JSON object"})
+
+    result = run_job(spec.get("id"), spec, template_pool)
+    result["id"] = result.pop("index")
+    result.pop("traceback", None)
+    if "bytes" in result:
+        result["bytes"] = base64.b64encode(result["bytes"]).decode("ascii")
+    return json.dumps(result)
+
+
+def serve_stream(reader, writer, template_pool):
+    """
+    Serve requests from a text stream until it is closed.
+
+    :param reader: Text file-like object with one deck spec per line
+    :param writer: Text file-like object the results are written to
+    :param template_pool: TemplatePool the templates are taken from
+    :return: Number of requests served
+    """
+    count = 0
+    for line in reader:
+        if not line.strip():
+            continue
+        writer.write(handle_line(line, template_pool) + "\n")
+        writer.flush()
+        count += 1
+    return count
+
+
+def serve_unix_socket(path, template_pool):
+    """
+    Serve requests on a Unix socket until the process is interrupted.
+
+    :param path: Path of the socket, replaced if it already exists
+    :param template_pool: TemplatePool shared by all connections
+    """
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                self.wfile.write((handle_line(line.decode("utf-8"), template_pool) + "\n").encode("utf-8"))
+                self.wfile.flush()
+
+    if os.path.exists(path):
+        os.unlink(path)
+
+    with socketserver.ThreadingUnixStreamServer(path, Handler) as server:
+        server.daemon_threads = True
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(path)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", help="serve on this Unix socket instead of stdin/stdout")
+    parser.add_argument("--warm", nargs="*", default=[], help="templates to parse on start")
+    parser.add_argument("--max-templates", type=int, default=8, help="number of parsed templates kept")
+    args = parser.parse_args(argv)
+
+    template_pool = TemplatePool(max_templates=args.max_templates)
+    warm_up(template_pool, args.warm)
+
+    if args.socket:
+        # Stop like on Ctrl-C, so the socket file is removed
+        signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            serve_unix_socket(args.socket, template_pool)
+        except KeyboardInterrupt:
+            pass
+    else:
+        serve_stream(sys.stdin, sys.stdout, template_pool)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())